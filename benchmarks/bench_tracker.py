@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+import argparse
+import copy
+import json
+import os
+import platform
+import pty
+import select
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pizza_tracker
+from eta_estimator import STAGES
+from replay import Recording, ReplaySession
+from sharding import ShardedEngine
+from tracking_engine import OrderState, TrackingEngine
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+STARTUP_SCRIPT = """
+import time
+started = time.perf_counter()
+import json, sys, threading
+sys.path.insert(0, sys.argv[1])
+import pizza_tracker
+from tracking_engine import OrderState, TrackingEngine
+imported = time.perf_counter()
+config = json.loads(sys.argv[2])
+first = threading.Event()
+engine = TrackingEngine(config, [OrderState("dominos", {"store_id": "1", "order_key": "STARTUP"})])
+engine.add_listener(lambda state: state.last_update_time and first.set())
+engine.start()
+first.wait(30)
+print(json.dumps({"imports": imported - started, "first_status": time.perf_counter() - started}))
+engine.stop()
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock(port, stage_seconds, latency_ms):
+    """Launch mock_pizza_api.py on port and wait until it answers."""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "mock_pizza_api.py"), "--host", "127.0.0.1", "--port", str(port),
+         "--threads", "32", "--stage-seconds", str(stage_seconds), "--latency-ms", str(latency_ms)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/fleet", timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.1)
+
+    process.kill()
+    raise RuntimeError("mock_pizza_api.py did not start")
+
+
+def bench_config(base_url, interval, max_in_flight):
+    config = copy.deepcopy(pizza_tracker.CONFIG)
+    #Has to be positive, a microsecond still polls as fast as possible
+    config["check_interval"] = interval or 1e-6
+    config["schedule"] = {"slow_interval": interval, "fast_interval": interval, "jitter": 0}
+    config["max_in_flight"] = max_in_flight
+    config["pizza_services"]["dominos"].update(enabled=True, base_url=base_url, rate_limit=None)
+    return config
+
+
+def make_orders(count):
+    return [OrderState("dominos", {"store_id": str(1000 + i % 100), "order_key": f"BENCH{i:07d}"}) for i in range(count)]
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+#A typical parsed response, decoded per order like real responses so no strings are shared
+SAMPLE_RESPONSE = json.dumps({
+    "raw_status": "OrderSent", "status": "Pizza is on its way!", "progress": 80, "eta": " 07:45 PM",
+    "description": "1x Large Pepperoni Pizza, 1x Garlic Bread, 1x Large Coke", "delivered": False, "distance": 1.5
+})
+
+
+def bench_memory(config, count):
+    """Bytes allocated per tracked order for its state plus the engine bookkeeping."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    orders = make_orders(count)
+    engine = TrackingEngine(config, orders)
+    for state in orders:
+        state.apply(json.loads(SAMPLE_RESPONSE))
+        engine.scheduler.schedule(state.key, 0)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return allocated / count
+
+
+def bench_polling(config, count, duration, max_in_flight, workers=0):
+    """Poll count orders for duration seconds, returns throughput, latency and CPU numbers.
+
+    With workers the orders are polled from that many worker processes and
+    the CPU numbers are the coordinator's alone.
+    """
+    orders = make_orders(count)
+    if workers:
+        engine = ShardedEngine(config, orders, workers=workers, max_in_flight=max_in_flight)
+    else:
+        engine = TrackingEngine(config, orders, max_in_flight=max_in_flight)
+
+    latencies = []
+    errors = [0]
+    measuring = threading.Event()
+
+    def on_check(state):
+        if measuring.is_set():
+            latencies.append(state.last_latency)
+            if state.last_error:
+                errors[0] += 1
+
+    engine.add_listener(on_check)
+    engine.start()
+
+    #Let every order get its first full response before measuring
+    time.sleep(min(2.0, duration / 4))
+
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    measuring.set()
+    time.sleep(duration)
+    measuring.clear()
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+
+    engine.stop()
+    engine.thread.join(timeout=5)
+
+    return {
+        "orders": count,
+        "workers": workers,
+        "polls": len(latencies),
+        "polls_per_second": len(latencies) / wall,
+        "errors": errors[0],
+        "latency_p50_ms": percentile(latencies, 0.50) * 1000 if latencies else None,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000 if latencies else None,
+        "cpu_seconds": cpu,
+        "cpu_ms_per_order_per_second": cpu / wall / count * 1000,
+        "cpu_us_per_poll": cpu / len(latencies) * 1e6 if latencies else None
+    }
+
+
+def make_recording(count, stage_seconds=120):
+    """Recording of count Domino's orders going through every stage, staggered over a minute."""
+    recording = Recording()
+    started = time.time()
+    eta = time.strftime(" %I:%M %p", time.localtime(started + len(STAGES) * stage_seconds))
+
+    for i in range(count):
+        key = recording.declare("dominos", {"store_id": str(1000 + i % 100), "order_key": f"REPLAY{i:07d}"})
+        for stage, status in enumerate(STAGES):
+            #Two checks per stage, the second one while out for delivery is closer
+            for half in range(2):
+                distance = max(2.0 - stage * 0.5 - half * 0.25, 0) if status != "OrderDelivered" else 0.0
+                body = {"order": {"orderStatus": status, "estimatedDeliveryTime": eta, "deliveryDistance": str(distance),
+                                  "orderDescription": "1x Large Pepperoni Pizza, 1x Garlic Bread, 1x Large Coke"}}
+                recording.add(key, started + i % 60 + (stage + half / 2) * stage_seconds, body)
+    return recording
+
+
+def bench_replay(count):
+    """Replay a synthetic session as fast as possible, timing everything but the network."""
+    session = ReplaySession(make_recording(count))
+    config = session.configure(copy.deepcopy(pizza_tracker.CONFIG))
+    engine = TrackingEngine(config, max_in_flight=config["max_in_flight"], clock=session.clock,
+                            transport_factory=session.transport)
+
+    checks = [0]
+    engine.add_listener(lambda state: checks.__setitem__(0, checks[0] + 1))
+
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    engine.start()
+    session.clock.finished.wait()
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+
+    engine.stop()
+    engine.thread.join(timeout=5)
+
+    return {
+        "orders": count,
+        "checks": checks[0],
+        "virtual_seconds": session.clock.elapsed(),
+        "wall_seconds": wall,
+        "checks_per_second": checks[0] / wall,
+        "cpu_us_per_check": cpu / checks[0] * 1e6 if checks[0] else None
+    }
+
+
+def render_child(output, frames):
+    """Runs inside a pseudo terminal, times layout and update_display()."""
+    import curses
+
+    def run(stdscr):
+        engine = TrackingEngine(pizza_tracker.CONFIG, [OrderState("dominos", {"store_id": "1", "order_key": "RENDER"})])
+        tracker = pizza_tracker.PizzaTrackerTerminal(stdscr, engine)
+        base = tracker.order
+
+        full = []
+        for _ in range(max(frames // 10, 1)):
+            started = time.perf_counter()
+            tracker.layout()
+            tracker.update_display()
+            full.append(time.perf_counter() - started)
+
+        incremental = []
+        for i in range(frames):
+            tracker.order = base._replace(progress=i % 101, current_status=f"Status {i % 7}")
+            started = time.perf_counter()
+            tracker.update_display()
+            incremental.append(time.perf_counter() - started)
+
+        unchanged = []
+        for _ in range(frames):
+            started = time.perf_counter()
+            tracker.update_display()
+            unchanged.append(time.perf_counter() - started)
+
+        with open(output, "w") as f:
+            json.dump({
+                "full_frame_us": statistics.median(full) * 1e6,
+                "changed_frame_us": statistics.median(incremental) * 1e6,
+                "unchanged_frame_us": statistics.median(unchanged) * 1e6
+            }, f)
+
+    curses.wrapper(run)
+
+
+def bench_render(frames):
+    """Run render_child in a pty so curses has a real terminal to draw on."""
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "render.json")
+        pid, fd = pty.fork()
+        if pid == 0:
+            os.environ["TERM"] = os.environ.get("TERM") or "xterm-256color"
+            os.environ["LINES"], os.environ["COLUMNS"] = "30", "80"
+            os.execv(sys.executable, [sys.executable, os.path.abspath(__file__), "--render-child", output, "--frames", str(frames)])
+
+        #Keep draining the terminal so the child never blocks on output
+        while True:
+            ready, _, _ = select.select([fd], [], [], 0.5)
+            if ready:
+                try:
+                    if not os.read(fd, 65536):
+                        break
+                except OSError:
+                    break
+            elif os.waitpid(pid, os.WNOHANG)[0]:
+                break
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+
+        if not os.path.exists(output):
+            return None
+        with open(output) as f:
+            return json.load(f)
+
+
+def bench_startup(config, runs=3):
+    """Spawn a fresh interpreter and time it to the first order status."""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT, ROOT, json.dumps(config)],
+            capture_output=True, text=True, timeout=60
+        ).stdout.strip().splitlines()
+        wall = time.perf_counter() - started
+        if output:
+            inner = json.loads(output[-1])
+            samples.append((wall, inner["imports"], inner["first_status"]))
+
+    if not samples:
+        return None
+    return {
+        "process_to_first_status_ms": statistics.median(s[0] for s in samples) * 1000,
+        "imports_ms": statistics.median(s[1] for s in samples) * 1000,
+        "import_to_first_status_ms": statistics.median(s[2] for s in samples) * 1000
+    }
+
+
+def compare(old, new):
+    """Print how every numeric result moved between two runs."""
+    def flatten(prefix, value, into):
+        if isinstance(value, dict):
+            for key, inner in value.items():
+                flatten(f"{prefix}.{key}" if prefix else key, inner, into)
+        elif isinstance(value, list):
+            for item in value:
+                flatten(f"{prefix}[{item.get('orders')}]", item, into)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            into[prefix] = value
+        return into
+
+    before = flatten("", old["results"], {})
+    after = flatten("", new["results"], {})
+    print(f"{'metric':<52} {'before':>12} {'after':>12} {'change':>9}")
+    for name in sorted(before.keys() & after.keys()):
+        change = (after[name] - before[name]) / before[name] * 100 if before[name] else 0.0
+        print(f"{name:<52} {before[name]:>12.2f} {after[name]:>12.2f} {change:>8.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the tracking pipeline against the local mock API")
+    parser.add_argument("--orders", default="1,100,10000", help="comma separated order counts to sweep")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to poll at each order count")
+    parser.add_argument("--interval", type=float, default=0.0, help="poll interval per order, 0 polls as fast as possible")
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=0, help="poll from this many worker processes, max-in-flight each")
+    parser.add_argument("--mock-url", help="use an already running mock instead of starting one")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latency injected by the spawned mock")
+    parser.add_argument("--replay-orders", default="100,1000", help="comma separated order counts to replay")
+    parser.add_argument("--frames", type=int, default=2000, help="frames timed for the render benchmark")
+    parser.add_argument("--output", help="where to write the JSON results (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--compare", metavar="RESULTS_JSON", help="compare against an earlier results file")
+    parser.add_argument("--render-child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.render_child:
+        render_child(args.render_child, args.frames)
+        return 0
+
+    mock = None
+    base_url = args.mock_url
+    if base_url is None:
+        port = free_port()
+        #Stages long enough that no order is delivered (and dropped) mid-run
+        mock = start_mock(port, stage_seconds=3600, latency_ms=args.latency_ms)
+        base_url = f"http://127.0.0.1:{port}/power/trackOrder"
+
+    try:
+        counts = [int(count) for count in args.orders.split(",")]
+        config = bench_config(base_url, args.interval, args.max_in_flight)
+
+        polling = []
+        for count in counts:
+            print(f"Polling {count} order(s) for {args.duration:g}s ...", file=sys.stderr)
+            result = bench_polling(config, count, args.duration, args.max_in_flight, args.workers)
+            result["memory_bytes_per_order"] = bench_memory(config, count)
+            polling.append(result)
+
+        replay = []
+        for count in [int(count) for count in args.replay_orders.split(",")]:
+            print(f"Replaying {count} order(s) ...", file=sys.stderr)
+            replay.append(bench_replay(count))
+
+        print("Timing renders ...", file=sys.stderr)
+        render = bench_render(args.frames)
+
+        print("Timing startup ...", file=sys.stderr)
+        startup = bench_startup(config)
+    finally:
+        if mock is not None:
+            mock.terminate()
+            mock.wait()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": vars(args),
+        "results": {"polling": polling, "replay": replay, "render": render, "startup": startup}
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=4)
+
+    print(json.dumps(report["results"], indent=4))
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_BREAKER_CONFIG = {
+    "window": 30,
+    "min_requests": 5,
+    "failure_rate": 0.5,
+    "open_seconds": 30,
+    "probes": 1,
+    "probe_interval": 1.0
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over a sliding window of request outcomes.
+
+    While closed every request goes through and outcomes are counted in one
+    second buckets. Once at least min_requests in the last `window` seconds
+    failed at failure_rate or worse the circuit opens and requests fail fast
+    for open_seconds. After that up to `probes` trial requests are let
+    through: a success closes the circuit, a failure opens it again.
+    """
+
+    def __init__(self, name, window=30, min_requests=5, failure_rate=0.5, open_seconds=30, probes=1, probe_interval=1.0):
+        self.name = name
+        self.window = window
+        self.min_requests = min_requests
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.probe_interval = probe_interval
+
+        self.state = CLOSED
+        self.opened_at = None
+        self.successes = 0
+        self.failures = 0
+        self._buckets = deque()
+        self._probing = 0
+
+    @classmethod
+    def from_config(cls, config, service):
+        settings = dict(DEFAULT_BREAKER_CONFIG)
+        settings.update(config.get("circuit_breaker", {}))
+        settings.update(config["pizza_services"][service].get("circuit_breaker", {}))
+        return cls(service, **settings)
+
+    def allow(self, now=None):
+        """True if a request may go out now, counting it as a probe when half-open."""
+        if self.state == CLOSED:
+            return True
+
+        now = now or time.monotonic()
+        if self.state == OPEN:
+            if now - self.opened_at < self.open_seconds:
+                return False
+            self.state = HALF_OPEN
+            self._probing = 0
+            logger.info(f"{self.name} circuit half-open, probing")
+
+        if self._probing < self.probes:
+            self._probing += 1
+            return True
+        return False
+
+    def retry_in(self, now=None):
+        """Seconds until a rejected request is worth trying again."""
+        if self.state == OPEN:
+            return max(self.opened_at + self.open_seconds - (now or time.monotonic()), 0)
+        if self.state == HALF_OPEN:
+            return self.probe_interval
+        return 0
+
+    def record(self, ok, now=None):
+        now = now or time.monotonic()
+
+        if self.state == HALF_OPEN:
+            self._probing = max(self._probing - 1, 0)
+            if ok:
+                self._close()
+            else:
+                self._open(now)
+            return
+        if self.state == OPEN:
+            #A request that was already in flight when the circuit opened
+            return
+
+        bucket = self._bucket(now)
+        if ok:
+            bucket[1] += 1
+            self.successes += 1
+        else:
+            bucket[2] += 1
+            self.failures += 1
+
+            total = self.successes + self.failures
+            if total >= self.min_requests and self.failures / total >= self.failure_rate:
+                self._open(now)
+
+    def _bucket(self, now):
+        second = int(now)
+
+        #Drop the buckets that slid out of the window, before adding this second's
+        while self._buckets and self._buckets[0][0] <= second - self.window:
+            _, successes, failures = self._buckets.popleft()
+            self.successes -= successes
+            self.failures -= failures
+
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0])
+        return self._buckets[-1]
+
+    def _open(self, now):
+        if self.state != OPEN:
+            logger.warning(
+                f"{self.name} circuit open for {self.open_seconds}s "
+                f"({self.failures} of {self.successes + self.failures} recent checks failed)"
+            )
+        self.state = OPEN
+        self.opened_at = now
+
+    def _close(self):
+        logger.info(f"{self.name} circuit closed, service recovered")
+        self.state = CLOSED
+        self.opened_at = None
+        self.successes = self.failures = 0
+        self._buckets.clear()
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+
+
+class SystemClock:
+    """Real time, what the engine runs on outside of replays."""
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    async def wait(self, event, timeout, idle):
+        """Wait until event is set or timeout seconds passed.
+
+        idle tells the clock that no check is in flight, which only a
+        virtual clock cares about.
+        """
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class VirtualClock:
+    """Clock starting at the epoch time `start` and stopping at `end`.
+
+    With a speed it runs that many times faster than real time. With
+    speed=None it stands still while checks are in flight and jumps
+    straight to the next deadline whenever the engine goes idle, so a
+    replay runs as fast as the tracker can process it and gives the same
+    result every time. `finished` is set once the clock reaches end or
+    nothing is left to check.
+    """
+
+    def __init__(self, start, speed=None, end=None):
+        self.start = start
+        self.speed = speed
+        self.end = end
+        self.finished = threading.Event()
+
+        self._elapsed = 0.0
+        self._anchor = time.monotonic()
+
+    def elapsed(self):
+        """Virtual seconds since start."""
+        elapsed = self._elapsed
+        if self.speed is not None:
+            elapsed += (time.monotonic() - self._anchor) * self.speed
+        if self.end is not None:
+            elapsed = min(elapsed, self.end - self.start)
+        return elapsed
+
+    def time(self):
+        return self.start + self.elapsed()
+
+    #Never goes backwards, and is never 0 for code treating 0 as "not given"
+    monotonic = time
+
+    def advance(self, seconds):
+        """Move a clock without a speed forward."""
+        self._elapsed += seconds
+
+    async def wait(self, event, timeout, idle):
+        left = None if self.end is None else self.end - self.time()
+        if idle and timeout is None:
+            #Nothing is left to check
+            self.finished.set()
+        elif left is not None and left <= 0:
+            self.finished.set()
+            timeout = None
+        elif left is not None:
+            timeout = left if timeout is None else min(timeout, left)
+
+        if self.speed is not None:
+            try:
+                await asyncio.wait_for(event.wait(), None if timeout is None else timeout / self.speed)
+            except asyncio.TimeoutError:
+                pass
+            return
+
+        #Time only moves once everything due now has been checked
+        if idle and timeout is not None:
+            self.advance(timeout)
+            await asyncio.sleep(0)
+        else:
+            await event.wait()
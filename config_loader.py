@@ -0,0 +1,278 @@
+import copy
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import threading
+import time
+
+from circuit_breaker import DEFAULT_BREAKER_CONFIG
+from eta_estimator import DEFAULT_ESTIMATOR_CONFIG
+from http_transport import DEFAULT_HTTP_CONFIG
+from poll_scheduler import DEFAULT_SCHEDULE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+#Sections that must be objects when present
+SECTIONS = ("schedule", "http", "event_log", "history", "notifications", "api", "cache", "circuit_breaker", "estimator",
+            "sharding")
+
+#Sections a running engine rebuilds from on reload, checked key by key against their defaults
+SECTION_DEFAULTS = {
+    "schedule": DEFAULT_SCHEDULE_CONFIG,
+    "http": DEFAULT_HTTP_CONFIG,
+    "circuit_breaker": DEFAULT_BREAKER_CONFIG,
+    "estimator": DEFAULT_ESTIMATOR_CONFIG
+}
+
+#Settings that break their component at 0: a pool that blocks forever, timeouts that never
+#connect, an empty breaker window, a breaker that opens with no requests or never probes
+POSITIVE_SETTINGS = {"pool_size", "connect_timeout", "read_timeout", "window", "min_requests", "probes"}
+
+#inotify(7) constants, see <sys/inotify.h>
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+
+class ConfigError(ValueError):
+    """The configuration file is well formed JSON but not a usable config."""
+
+
+def deep_merge(base, override):
+    """Return a copy of base with override merged in, recursing into objects."""
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def _require(condition, message):
+    if not condition:
+        raise ConfigError(message)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _check_section(path, section, defaults):
+    """Reject keys that are not in defaults and values of a different type than the default."""
+    _require(isinstance(section, dict), f"{path} must be an object")
+    for key, value in section.items():
+        _require(key in defaults, f"{path}.{key} is not a known setting")
+        default = defaults[key]
+        if isinstance(default, dict):
+            _check_section(f"{path}.{key}", value, default)
+        elif _is_number(default) and key in POSITIVE_SETTINGS:
+            _require(_is_number(value) and value > 0, f"{path}.{key} must be a positive number")
+        elif _is_number(default):
+            _require(_is_number(value) and value >= 0, f"{path}.{key} must be a non-negative number")
+        elif default is not None:
+            _require(isinstance(value, type(default)), f"{path}.{key} must be a {type(default).__name__}")
+
+
+class ServiceSettings:
+    """Validated settings of one pizza service."""
+
+    __slots__ = ("name", "enabled", "base_url", "rate_limit", "max_in_flight", "tracking_params", "raw")
+
+    def __init__(self, name, raw):
+        _require(isinstance(raw, dict), f"pizza_services.{name} must be an object")
+        self.name = name
+        self.raw = raw
+        self.enabled = raw.get("enabled", False)
+        self.base_url = raw.get("base_url")
+        self.rate_limit = raw.get("rate_limit")
+        self.max_in_flight = raw.get("max_in_flight")
+        self.tracking_params = raw.get("tracking_params", {})
+
+        _require(isinstance(self.enabled, bool), f"pizza_services.{name}.enabled must be true or false")
+        _require(self.base_url is None or isinstance(self.base_url, str), f"pizza_services.{name}.base_url must be a URL")
+        _require(self.rate_limit is None or (_is_number(self.rate_limit) and self.rate_limit > 0),
+                 f"pizza_services.{name}.rate_limit must be a positive number")
+        _require(self.max_in_flight is None or (isinstance(self.max_in_flight, int) and not isinstance(self.max_in_flight, bool)
+                                                and self.max_in_flight > 0),
+                 f"pizza_services.{name}.max_in_flight must be a positive integer")
+        _require(isinstance(self.tracking_params, dict), f"pizza_services.{name}.tracking_params must be an object")
+        if "circuit_breaker" in raw:
+            _check_section(f"pizza_services.{name}.circuit_breaker", raw["circuit_breaker"], DEFAULT_BREAKER_CONFIG)
+
+    def __eq__(self, other):
+        return isinstance(other, ServiceSettings) and self.raw == other.raw
+
+    __hash__ = None
+
+
+class Settings:
+    """Validated, immutable view of a whole config dict.
+
+    Built once per (re)load, so a bad edit is rejected as a whole before
+    anything running sees it, and two loads can be compared service by
+    service to find out what actually changed.
+    """
+
+    __slots__ = ("raw", "check_interval", "max_in_flight", "services", "orders")
+
+    def __init__(self, raw):
+        _require(isinstance(raw, dict), "the config must be a JSON object")
+        self.raw = raw = copy.deepcopy(raw)
+        self.check_interval = raw.get("check_interval")
+        self.max_in_flight = raw.get("max_in_flight", 32)
+
+        _require(_is_number(self.check_interval) and self.check_interval > 0, "check_interval must be a positive number")
+        _require(isinstance(self.max_in_flight, int) and self.max_in_flight > 0, "max_in_flight must be a positive integer")
+        for section in SECTIONS:
+            _require(isinstance(raw.get(section, {}), dict), f"{section} must be an object")
+        for section, defaults in SECTION_DEFAULTS.items():
+            _check_section(section, raw.get(section, {}), defaults)
+
+        services = raw.get("pizza_services")
+        _require(isinstance(services, dict), "pizza_services must be an object")
+        self.services = {name: ServiceSettings(name, service) for name, service in services.items()}
+
+        orders = raw.get("orders", [])
+        _require(isinstance(orders, list), "orders must be a list")
+        for i, order in enumerate(orders):
+            _require(isinstance(order, dict) and isinstance(order.get("service"), str),
+                     f"orders[{i}] must be an object with a service")
+        self.orders = tuple(orders)
+
+    def breaker(self, name):
+        """Circuit breaker settings of a service: the defaults, the global section, then its own."""
+        settings = dict(DEFAULT_BREAKER_CONFIG)
+        settings.update(self.raw.get("circuit_breaker", {}))
+        settings.update(self.services[name].raw.get("circuit_breaker", {}))
+        return settings
+
+    def changed_services(self, other):
+        """Names of the services whose settings differ between self and other."""
+        if self.raw.get("http") != other.raw.get("http"):
+            return set(self.services) | set(other.services)
+        names = set(self.services) | set(other.services)
+        return {
+            name for name in names
+            if self.services.get(name) != other.services.get(name) or self.breaker(name) != other.breaker(name)
+        }
+
+
+def load_file(path, defaults):
+    """Read path, deep-merge it over defaults and validate, returns the config dict."""
+    with open(path) as f:
+        loaded = json.load(f)
+    _require(isinstance(loaded, dict), "the config must be a JSON object")
+
+    config = deep_merge(defaults, loaded)
+    Settings(config)
+    return config
+
+
+class ConfigWatcher:
+    """Calls every listener with a freshly loaded config whenever path changes.
+
+    Uses inotify on the file's directory where available (so editors that
+    save by renaming are noticed too) and falls back to polling the file's
+    mtime and size every `interval` seconds. A config that fails to load
+    is logged and ignored, listeners keep running on the previous one.
+    """
+
+    def __init__(self, path, load, interval=1.0):
+        self.path = os.path.abspath(path)
+        self.load = load
+        self.interval = interval
+        self.listeners = []
+        self.running = False
+
+        self._signature = self.signature()
+        self._thread = None
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self):
+        """Reload if the file changed since the last check, returns True if it did."""
+        signature = self.signature()
+        if signature == self._signature or signature is None:
+            return False
+        self._signature = signature
+
+        try:
+            config = self.load()
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring invalid configuration in {self.path}: {e}")
+            return False
+
+        logger.info(f"Configuration reloaded from {self.path}")
+        for callback in self.listeners:
+            callback(config)
+        return True
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="pizza-config")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        fd = self._inotify()
+        try:
+            while self.running:
+                if fd is None:
+                    time.sleep(self.interval)
+                else:
+                    ready, _, _ = select.select([fd], [], [], self.interval)
+                    if ready:
+                        self._drain(fd)
+                        #Let the writer finish before reading
+                        time.sleep(0.05)
+                self.check()
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def _inotify(self):
+        """inotify descriptor watching the config directory, or None to poll."""
+        name = ctypes.util.find_library("c")
+        if name is None:
+            return None
+        try:
+            libc = ctypes.CDLL(name, use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if libc.inotify_add_watch(fd, os.path.dirname(self.path).encode(), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _drain(self, fd):
+        #Only whether something happened matters, check() looks at the file itself
+        try:
+            while os.read(fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
@@ -0,0 +1,4 @@
+#The modules live at the top level, this file puts it on sys.path for the tests
+
+#Plays a sound for five seconds, run it by hand
+collect_ignore = ["test_sound.py"]
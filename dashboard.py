@@ -0,0 +1,184 @@
+import curses
+
+from eta_estimator import STAGES
+
+STAGE_INDEX = {stage: i for i, stage in enumerate(STAGES)}
+
+#Column the table is sorted by, cycled with `o`
+SORT_KEYS = {
+    "status": lambda snapshot: (STAGE_INDEX.get(snapshot.raw_status, -1), snapshot.predicted_progress, snapshot.key),
+    "progress": lambda snapshot: (max(snapshot.progress, snapshot.predicted_progress), snapshot.key),
+    "distance": lambda snapshot: (snapshot.delivery_distance is None, snapshot.delivery_distance or 0, snapshot.key),
+    "service": lambda snapshot: (snapshot.service, snapshot.key),
+    "order": lambda snapshot: snapshot.key
+}
+
+MINI_BAR_WIDTH = 10
+
+
+class OrderTable:
+    """Latest snapshot of every order plus the sorted, filtered row order.
+
+    Rows are only re-sorted when a snapshot changed since the last
+    refresh(), and at most once per frame.
+    """
+
+    def __init__(self):
+        self.snapshots = {}
+        self.rows = []
+        self.sort = "status"
+        self.reverse = False
+        self.service = None
+        self.status = None
+        self.stale = True
+
+    def update(self, snapshot):
+        self.snapshots[snapshot.key] = snapshot
+        self.stale = True
+
+    def remove(self, key):
+        if self.snapshots.pop(key, None) is not None:
+            self.stale = True
+
+    def matches(self, snapshot):
+        return ((self.service is None or snapshot.service == self.service)
+                and (self.status is None or snapshot.raw_status == self.status))
+
+    def refresh(self):
+        if self.stale:
+            rows = [snapshot for snapshot in self.snapshots.values() if self.matches(snapshot)]
+            rows.sort(key=SORT_KEYS[self.sort], reverse=self.reverse)
+            self.rows = rows
+            self.stale = False
+        return self.rows
+
+    def cycle_sort(self):
+        names = list(SORT_KEYS)
+        self.sort = names[(names.index(self.sort) + 1) % len(names)]
+        self.stale = True
+
+    def toggle_reverse(self):
+        self.reverse = not self.reverse
+        self.stale = True
+
+    def cycle_service(self):
+        self.service = self._next(self.service, sorted({snapshot.service for snapshot in self.snapshots.values()}))
+
+    def cycle_status(self):
+        self.status = self._next(self.status, list(STAGES))
+
+    def _next(self, current, choices):
+        #None (no filter) first, then every choice in turn
+        options = [None] + choices
+        self.stale = True
+        return options[(options.index(current) + 1) % len(options)] if current in options else None
+
+
+class DashboardView:
+    """Scrollable one-row-per-order table drawn into a viewport-sized pad.
+
+    Only the rows on screen are ever formatted, and a row is rewritten only
+    when its snapshot or selection changed, so scrolling through thousands
+    of orders costs the same as showing a handful.
+    """
+
+    HEADER_ROWS = 2
+    FOOTER_ROWS = 1
+
+    def __init__(self, stdscr, table):
+        self.stdscr = stdscr
+        self.table = table
+        self.top = 0
+        self.selected = 0
+        self.pad = None
+        self.height = self.width = self.visible = 0
+        self.drawn = []
+
+    def layout(self, height, width):
+        self.height, self.width = height, width
+        self.visible = max(height - self.HEADER_ROWS - self.FOOTER_ROWS, 0)
+        self.pad = curses.newpad(max(self.visible, 1), max(width, 1))
+        self.drawn = [None] * self.visible
+        self.header = None
+
+    def selected_key(self):
+        rows = self.table.refresh()
+        return rows[self.selected].key if rows else None
+
+    def move(self, delta):
+        self.selected += delta
+        self._clamp()
+
+    def handle_key(self, key):
+        """Apply a navigation, sort or filter key, returns False if it was not one."""
+        page = max(self.visible - 1, 1)
+        actions = {
+            curses.KEY_UP: lambda: self.move(-1), ord('k'): lambda: self.move(-1),
+            curses.KEY_DOWN: lambda: self.move(1), ord('j'): lambda: self.move(1),
+            curses.KEY_PPAGE: lambda: self.move(-page), curses.KEY_NPAGE: lambda: self.move(page),
+            curses.KEY_HOME: lambda: self.move(-len(self.table.rows)), curses.KEY_END: lambda: self.move(len(self.table.rows)),
+            ord('o'): self.table.cycle_sort, ord('r'): self.table.toggle_reverse,
+            ord('f'): self.table.cycle_service, ord('t'): self.table.cycle_status
+        }
+        action = actions.get(key)
+        if action is None:
+            return False
+        action()
+        self._clamp()
+        return True
+
+    def _clamp(self):
+        count = len(self.table.refresh())
+        self.selected = min(max(self.selected, 0), max(count - 1, 0))
+
+        #Scroll just enough to keep the selection on screen
+        if self.selected < self.top:
+            self.top = self.selected
+        elif self.selected >= self.top + self.visible:
+            self.top = self.selected - self.visible + 1
+        self.top = min(max(self.top, 0), max(count - self.visible, 0))
+
+    def format_row(self, snapshot):
+        progress = max(snapshot.progress, snapshot.predicted_progress)
+        filled = MINI_BAR_WIDTH * progress // 100
+        bar = "█" * filled + "░" * (MINI_BAR_WIDTH - filled)
+        ident = snapshot.key.partition(":")[2]
+        eta = (snapshot.predicted_eta or snapshot.delivery_eta or "").strip()
+        distance = "" if snapshot.delivery_distance is None else f"{snapshot.delivery_distance:.1f}mi"
+        return (f" {snapshot.service[:10]:<10} {ident[:20]:<20} {snapshot.current_status[:22]:<22} "
+                f"{eta:>8} {distance:>7} {bar} {progress:>3}%")
+
+    def draw(self):
+        """Write the header, the visible rows that changed and the footer."""
+        rows = self.table.refresh()
+        self._clamp()
+        usable = max(self.width - 1, 0)
+
+        header = (f" Orders: {len(rows)}/{len(self.table.snapshots)}  sort: {self.table.sort}"
+                  f"{' (desc)' if self.table.reverse else ''}  service: {self.table.service or 'all'}"
+                  f"  status: {self.table.status or 'all'}")
+        if header != self.header:
+            self.header = header
+            self.stdscr.addstr(0, 0, header[:usable].ljust(usable), curses.A_BOLD)
+            columns = f" {'SERVICE':<10} {'ORDER':<20} {'STATUS':<22} {'ETA':>8} {'DIST':>7} {'PROGRESS':<{MINI_BAR_WIDTH + 5}}"
+            self.stdscr.addstr(1, 0, columns[:usable].ljust(usable), curses.A_UNDERLINE)
+            footer = " ↑↓ move  Enter details  o sort  r reverse  f service  t status  q quit"
+            self.stdscr.addstr(self.height - 1, 0, footer[:usable], curses.A_DIM)
+            self.stdscr.noutrefresh()
+
+        for i in range(self.visible):
+            index = self.top + i
+            snapshot = rows[index] if index < len(rows) else None
+            selected = index == self.selected
+
+            #Snapshots are immutable, the same object means the same text
+            if self.drawn[i] is not None and self.drawn[i][0] is snapshot and self.drawn[i][1] == selected:
+                continue
+            self.drawn[i] = (snapshot, selected)
+
+            text = self.format_row(snapshot) if snapshot is not None else ""
+            attr = curses.A_REVERSE if selected and snapshot is not None else 0
+            self.pad.addstr(i, 0, text[:usable].ljust(usable), attr)
+
+        if self.visible:
+            self.pad.noutrefresh(0, 0, self.HEADER_ROWS, 0, self.HEADER_ROWS + self.visible - 1, self.width - 1)
@@ -0,0 +1,144 @@
+import time
+from datetime import datetime
+
+#Canonical stages in order, with the progress the status tables give each
+STAGES = ("OrderPlaced", "OrderMaking", "OrderBaking", "OrderSent", "OrderDelivered")
+STAGE_PROGRESS = {"OrderPlaced": 20, "OrderMaking": 40, "OrderBaking": 60, "OrderSent": 80, "OrderDelivered": 100}
+
+DEFAULT_ESTIMATOR_CONFIG = {
+    "alpha": 0.2,
+    "velocity_alpha": 0.3,
+    "stage_seconds": {
+        "OrderPlaced": 120,
+        "OrderMaking": 300,
+        "OrderBaking": 480,
+        "OrderSent": 900
+    }
+}
+
+
+class OrderEstimate:
+    """The few numbers the estimator keeps per order."""
+
+    __slots__ = ("stage", "stage_started", "saw_start", "distance", "distance_time", "start_distance", "velocity")
+
+    def __init__(self):
+        self.stage = None
+        self.stage_started = None
+        self.saw_start = False
+        self.distance = None
+        self.distance_time = None
+        self.start_distance = None
+        self.velocity = None
+
+
+class EtaEstimator:
+    """Online delivery time and progress prediction.
+
+    Stage durations are learnt per service as exponential moving averages
+    of the transitions seen so far; while an order is out for delivery its
+    speed is an EMA over the drops in deliveryDistance. Every update is O(1)
+    and nothing but an OrderEstimate is kept per order.
+    """
+
+    def __init__(self, alpha=0.2, velocity_alpha=0.3, stage_seconds=None):
+        self.configure(alpha, velocity_alpha, stage_seconds)
+        self.stage_seconds = {}
+        self.orders = {}
+
+    @staticmethod
+    def settings(config):
+        settings = dict(DEFAULT_ESTIMATOR_CONFIG)
+        settings.update(config.get("estimator", {}))
+        return settings
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(**cls.settings(config))
+
+    def configure(self, alpha=0.2, velocity_alpha=0.3, stage_seconds=None):
+        """Set the smoothing factors and default stage lengths, keeping everything learnt so far."""
+        self.alpha = alpha
+        self.velocity_alpha = velocity_alpha
+        self.default_seconds = dict(DEFAULT_ESTIMATOR_CONFIG["stage_seconds"], **(stage_seconds or {}))
+
+    def expected(self, service, stage):
+        """Learnt (or default) seconds an order of service spends in stage."""
+        seconds = self.stage_seconds.get((service, stage))
+        return self.default_seconds.get(stage, 0) if seconds is None else seconds
+
+    def learn(self, service, stage, seconds):
+        previous = self.stage_seconds.get((service, stage))
+        if previous is None:
+            self.stage_seconds[(service, stage)] = seconds
+        else:
+            self.stage_seconds[(service, stage)] = previous + self.alpha * (seconds - previous)
+
+    def forget(self, key):
+        self.orders.pop(key, None)
+
+    def update(self, state, now=None):
+        """Fold the latest check of state in and set its predicted_eta and predicted_progress."""
+        if state.raw_status not in STAGE_PROGRESS:
+            return
+
+        now = now or time.time()
+        estimate = self.orders.get(state.key)
+        if estimate is None:
+            estimate = self.orders[state.key] = OrderEstimate()
+
+        changed = state.raw_status != estimate.stage
+        if changed:
+            #Only a stage we saw begin gives an honest duration
+            if estimate.saw_start:
+                self.learn(state.service, estimate.stage, now - estimate.stage_started)
+            estimate.saw_start = estimate.stage is not None
+            estimate.stage = state.raw_status
+            estimate.stage_started = now
+            if state.raw_status == "OrderSent":
+                estimate.start_distance = state.delivery_distance
+
+        distance = state.delivery_distance
+        if distance is not None and distance != estimate.distance:
+            if estimate.distance is not None and distance < estimate.distance and now > estimate.distance_time:
+                speed = (estimate.distance - distance) / (now - estimate.distance_time)
+                if estimate.velocity is None:
+                    estimate.velocity = speed
+                else:
+                    estimate.velocity += self.velocity_alpha * (speed - estimate.velocity)
+            if state.raw_status == "OrderSent" and (estimate.start_distance is None or distance > estimate.start_distance):
+                estimate.start_distance = distance
+            estimate.distance = distance
+            estimate.distance_time = now
+
+        if state.raw_status == "OrderDelivered":
+            state.predicted_eta = None
+            state.predicted_progress = 100
+            self.forget(state.key)
+            return
+
+        remaining, fraction = self.remaining(state, estimate, now)
+        state.predicted_eta = datetime.fromtimestamp(now + remaining).strftime("%I:%M %p")
+
+        #Glide from this stage's progress towards the next one's without reaching it or going back
+        stage = STAGES.index(estimate.stage)
+        low, high = STAGE_PROGRESS[estimate.stage], STAGE_PROGRESS[STAGES[stage + 1]]
+        floor = state.progress if changed else max(state.progress, state.predicted_progress)
+        state.predicted_progress = max(floor, min(int(low + (high - low) * fraction), high - 1))
+
+    def remaining(self, state, estimate, now):
+        """(seconds until delivery, fraction of the current stage done)."""
+        stage = estimate.stage
+        elapsed = now - estimate.stage_started
+        expected = self.expected(state.service, stage)
+
+        if stage == "OrderSent" and estimate.velocity and estimate.distance is not None:
+            remaining = max(estimate.distance / estimate.velocity - (now - estimate.distance_time), 0)
+            if estimate.start_distance:
+                return remaining, 1 - estimate.distance / estimate.start_distance
+            return remaining, min(elapsed / (elapsed + remaining), 1) if elapsed + remaining else 0
+
+        remaining = max(expected - elapsed, 0)
+        for later in STAGES[STAGES.index(stage) + 1:-1]:
+            remaining += self.expected(state.service, later)
+        return remaining, min(elapsed / expected, 1) if expected else 0
@@ -0,0 +1,188 @@
+import glob
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import traceback
+from collections import deque
+
+DEFAULT_EVENT_LOG_CONFIG = {
+    "path": "events.jsonl",
+    "max_bytes": 5 * 1024 * 1024,
+    "max_age": 24 * 3600,
+    "backups": 5,
+    "flush_interval": 1.0,
+    "buffer_size": 1000,
+    "compress": True
+}
+
+
+class EventLog:
+    """Buffered JSON-lines event log with size/time based rotation.
+
+    emit() only appends to an in-memory deque. A background thread writes
+    the buffer out in one batch every flush_interval seconds (or sooner
+    when buffer_size events are waiting), keeping the file open between
+    batches. Rotated files are gzipped and only the newest `backups` kept.
+    """
+
+    def __init__(self, path="events.jsonl", max_bytes=5 * 1024 * 1024, max_age=24 * 3600,
+                 backups=5, flush_interval=1.0, buffer_size=1000, compress=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.compress = compress
+
+        self._buffer = deque()
+        self._file = None
+        self._opened_at = None
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._running = False
+
+    @classmethod
+    def from_config(cls, config):
+        settings = dict(DEFAULT_EVENT_LOG_CONFIG)
+        settings.update(config.get("event_log", {}))
+        return cls(**settings)
+
+    def emit(self, event, **fields):
+        """Queue one event, cheap enough to call from any hot path or thread."""
+        record = {"ts": round(time.time(), 3), "event": event}
+        record.update(fields)
+        self._buffer.append(record)
+
+        if len(self._buffer) >= self.buffer_size:
+            self._wakeup.set()
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._flush_loop, name="pizza-event-log")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def _flush_loop(self):
+        while self._running:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                #Nowhere better to report it, the log itself is what failed
+                logging.getLogger(__name__).warning(f"Could not write event log: {e}")
+
+    def flush(self):
+        """Write every buffered event in a single batch."""
+        with self._write_lock:
+            if not self._buffer:
+                return
+
+            lines = []
+            while self._buffer:
+                lines.append(json.dumps(self._buffer.popleft(), default=str))
+
+            if self._file is None:
+                self._open()
+
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+
+            if self._should_rotate():
+                self._rotate()
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._opened_at = time.time()
+
+    def _should_rotate(self):
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            return True
+        return bool(self.max_age) and time.time() - self._opened_at >= self.max_age
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+
+        rotated = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}"
+        suffix = 1
+        while os.path.exists(rotated) or os.path.exists(rotated + ".gz"):
+            rotated = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+            suffix += 1
+        os.replace(self.path, rotated)
+
+        if self.compress:
+            with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+
+        self._prune()
+
+    def _prune(self):
+        old = sorted(glob.glob(glob.escape(self.path) + ".*"), key=os.path.getmtime, reverse=True)
+        for path in old[self.backups:]:
+            os.remove(path)
+
+    def close(self):
+        self._running = False
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class EventLogHandler(logging.Handler):
+    """Logging handler that turns log records into event log entries."""
+
+    def __init__(self, event_log, level=logging.INFO):
+        super().__init__(level)
+        self.event_log = event_log
+
+    def emit(self, record):
+        fields = {
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            fields["traceback"] = "".join(traceback.format_exception(*record.exc_info))
+        self.event_log.emit("log", **fields)
+
+
+def capture_logging(event_log, console=True):
+    """Send all logging to event_log, optionally detaching the console handlers.
+
+    Returns a function that undoes the change. The curses UI runs with
+    console=False so log lines can't scribble over the screen.
+    """
+    root = logging.getLogger()
+    handler = EventLogHandler(event_log)
+    root.addHandler(handler)
+
+    detached = []
+    if not console:
+        for existing in list(root.handlers):
+            if type(existing) is logging.StreamHandler:
+                root.removeHandler(existing)
+                detached.append(existing)
+
+    def restore():
+        root.removeHandler(handler)
+        for existing in detached:
+            root.addHandler(existing)
+
+    return restore
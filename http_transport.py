@@ -0,0 +1,105 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+DEFAULT_HTTP_CONFIG = {
+    "pool_size": 32,
+    "connect_timeout": 3.05,
+    "read_timeout": 10
+}
+
+
+class NotModified(Exception):
+    """Raised when the server answered 304 and there was no cached body to fall back on."""
+
+
+class ServiceTransport:
+    """Pooled keep-alive HTTP session for one pizza service.
+
+    Remembers the ETag/Last-Modified validators of every URL it fetched and
+    sends them back as If-None-Match/If-Modified-Since, so an order that has
+    not changed costs a 304 instead of a full JSON body.
+    """
+
+    def __init__(self, service, pool_size=32, connect_timeout=3.05, read_timeout=10):
+        #requests is slow to import, so it waits until the first transport is built
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.service = service
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._validators = {}
+        self._lock = threading.Lock()
+
+    def get_json(self, url, params=None):
+        """GET url and decode its JSON body.
+
+        Returns (data, changed). changed is False and data None when the
+        server answered 304 Not Modified.
+        """
+        cache_key = (url, tuple(sorted((params or {}).items())))
+
+        with self._lock:
+            cached = self._validators.get(cache_key)
+
+        headers = {}
+        if cached is not None:
+            etag, last_modified = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304:
+            if cached is None:
+                raise NotModified(f"{self.service} answered 304 for an uncached request")
+            return None, False
+
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to get status. Status code: {response.status_code}")
+
+        data = response.json()
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        with self._lock:
+            if etag or last_modified:
+                self._validators[cache_key] = (etag, last_modified)
+            else:
+                self._validators.pop(cache_key, None)
+
+        return data, True
+
+    def forget(self, url, params=None):
+        """Drop the validators for a URL, e.g. when its order stops being tracked."""
+        with self._lock:
+            self._validators.pop((url, tuple(sorted((params or {}).items()))), None)
+
+    def close(self):
+        self.session.close()
+
+
+def build_transport(service, service_config, http_config=None):
+    """Create a ServiceTransport using the global http settings and per-service overrides."""
+    settings = dict(DEFAULT_HTTP_CONFIG)
+    settings.update(http_config or {})
+    settings.update(service_config.get("http", {}))
+
+    return ServiceTransport(
+        service,
+        pool_size=settings["pool_size"],
+        connect_timeout=settings["connect_timeout"],
+        read_timeout=settings["read_timeout"]
+    )
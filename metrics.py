@@ -0,0 +1,217 @@
+import threading
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+#Seconds, from a fast local 304 up to a request that timed out
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def format_labels(names, values, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metric:
+    """A named metric family, children are created per distinct label values."""
+
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self.new_child())
+        return child
+
+    def new_child(self):
+        raise NotImplementedError
+
+    def children(self):
+        """[(label values, child)], safe to iterate while the engine thread adds children."""
+        #list() copies the items in one step under the GIL, iterating the dict itself is not safe
+        return list(self._children.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self.children()):
+            values = tuple(escape(value) for value in values)
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class CounterValue:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, values):
+        yield f"{name}{format_labels(labelnames, values)} {self.value:g}"
+
+
+class GaugeValue(CounterValue):
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+
+class HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given quantile, None if empty."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def render(self, name, labelnames, values):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            bucket = format_labels(labelnames, values, 'le="%g"' % bound)
+            yield f"{name}_bucket{bucket} {cumulative}"
+        bucket = format_labels(labelnames, values, 'le="+Inf"')
+        yield f"{name}_bucket{bucket} {self.count}"
+        yield f"{name}_sum{format_labels(labelnames, values)} {self.sum:g}"
+        yield f"{name}_count{format_labels(labelnames, values)} {self.count}"
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def new_child(self):
+        return CounterValue()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def new_child(self):
+        return GaugeValue()
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def new_child(self):
+        return HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+class Registry:
+    """Every metric in the process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics.setdefault(metric.name, metric)
+        return self.metrics[metric.name]
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+#Hot paths observe into these module-level metrics, like prometheus_client
+REGISTRY = Registry()
+
+FETCH_SECONDS = REGISTRY.histogram("pizza_fetch_seconds", "Time spent fetching one order status", ("service",))
+PARSE_SECONDS = REGISTRY.histogram(
+    "pizza_parse_seconds", "Time spent parsing one status response", ("service",),
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01)
+)
+RENDER_SECONDS = REGISTRY.histogram(
+    "pizza_render_seconds", "Time spent drawing one frame of the terminal UI",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+POLL_LAG_SECONDS = REGISTRY.histogram("pizza_poll_lag_seconds", "How late due checks started compared to their schedule")
+CHECKS = REGISTRY.counter("pizza_checks_total", "Completed status checks", ("service",))
+ERRORS = REGISTRY.counter("pizza_errors_total", "Failed status checks by exception type", ("service", "type"))
+ORDERS = REGISTRY.gauge("pizza_orders_tracked", "Orders currently tracked")
+CIRCUIT_OPEN = REGISTRY.gauge("pizza_circuit_open", "1 while a service's circuit breaker is open", ("service",))
+
+
+def metrics_route():
+    """Handler for StatusServer.add_route serving REGISTRY."""
+    return 200, CONTENT_TYPE, REGISTRY.render().encode()
+
+
+def summary_lines():
+    """Short human readable digest of the metrics for the on-screen stats panel."""
+    def ms(histogram, fraction):
+        value = histogram.quantile(fraction)
+        return "-" if value is None else f"{value * 1000:g}"
+
+    lines = []
+    for (service,), fetch in sorted(FETCH_SECONDS.children()):
+        lines.append(f"{service}: fetch p50<={ms(fetch, 0.5)}ms p99<={ms(fetch, 0.99)}ms")
+
+    render = RENDER_SECONDS.labels()
+    lag = POLL_LAG_SECONDS.labels()
+    lines.append(f"render p50<={ms(render, 0.5)}ms  lag p99<={ms(lag, 0.99)}ms")
+
+    checks = sum(child.value for _, child in CHECKS.children())
+    errors = sum(child.value for _, child in ERRORS.children())
+    lines.append(f"checks {checks:g}  errors {errors:g}")
+    return lines
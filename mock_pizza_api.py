@@ -1,19 +1,22 @@
 #!/usr/bin/env python3
 
 from flask import Flask, jsonify, request
-import time
-import threading
+import argparse
+import math
 import random
-from datetime import datetime, timedelta
+import threading
+import time
+import zlib
+from array import array
+from datetime import datetime, timezone
 
 app = Flask(__name__)
 
-#Global variables
-ORDER_STATUS = "OrderPlaced"
-START_TIME = datetime.now()
-DELIVERY_TIME = START_TIME + timedelta(minutes=30)
-DELIVERY_DISTANCE = 2.0  # miles
+DEFAULT_STORE_ID = "1234"
+DEFAULT_ORDER_KEY = "ABCD1234"
 ORDER_DESCRIPTION = "1x Large Pepperoni Pizza, 1x Garlic Bread, 1x Large Coke"
+START_DISTANCE = 2.0  # miles
+QUOTED_DELIVERY_SECONDS = 30 * 60
 
 STATUS_TIMINGS = {
     "OrderPlaced": 10,
@@ -24,94 +27,281 @@ STATUS_TIMINGS = {
 }
 
 STATUS_SEQUENCE = ["OrderPlaced", "OrderMaking", "OrderBaking", "OrderSent", "OrderDelivered"]
+SENT_INDEX = STATUS_SEQUENCE.index("OrderSent")
+
+#Distance only changes in steps of this many seconds, like a driver's GPS ping
+DISTANCE_STEP = 10
+
+#Pizza Hut and Papa John's report the same simulated orders in their own formats
+PIZZA_HUT_STATUS = {
+    "OrderPlaced": "RECEIVED",
+    "OrderMaking": "PREPARING",
+    "OrderBaking": "IN_OVEN",
+    "OrderSent": "OUT_FOR_DELIVERY",
+    "OrderDelivered": "DELIVERED"
+}
+
+PAPA_JOHNS_STAGE = {
+    "OrderPlaced": "placed",
+    "OrderMaking": "prep",
+    "OrderBaking": "oven",
+    "OrderSent": "out",
+    "OrderDelivered": "delivered"
+}
+
+#Fault injection, changed from the command line or /faults
+FAULTS = {
+    "latency_ms": 0.0,
+    "latency_jitter_ms": 0.0,
+    "error_rate": 0.0,
+    "timeout_rate": 0.0,
+    "timeout_seconds": 30.0
+}
+
+
+class Fleet:
+    """Every simulated order, stored column-wise in arrays.
+
+    An order is just a row: when it was placed, how fast it moves through
+    the stages, how far away the driver starts and a version bumped by
+    manual changes. Status, distance and ETA are computed from the clock
+    when an order is read, so no thread or timer exists per order.
+    """
+
+    def __init__(self, stage_seconds=None):
+        self.stage_seconds = [STATUS_TIMINGS[status] if stage_seconds is None else stage_seconds
+                              for status in STATUS_SEQUENCE[:-1]]
+        self.stage_starts = [sum(self.stage_seconds[:i]) for i in range(len(self.stage_seconds) + 1)]
+
+        self.index = {}
+        self.created = array('d')
+        self.speed = array('f')
+        self.start_distance = array('f')
+        self.version = array('I')
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.created)
+
+    def get(self, store_id, order_key, now=None):
+        """Row number of an order, placing it on first sight."""
+        key = (store_id, order_key)
+        row = self.index.get(key)
+        if row is not None:
+            return row
+
+        with self.lock:
+            row = self.index.get(key)
+            if row is None:
+                #Stable per-order variation so the fleet doesn't move in lockstep
+                rng = random.Random(zlib.crc32(f"{store_id}/{order_key}".encode()))
+                row = len(self.created)
+                self.created.append(now or time.time())
+                self.speed.append(rng.uniform(0.8, 1.25) if key != (DEFAULT_STORE_ID, DEFAULT_ORDER_KEY) else 1.0)
+                self.start_distance.append(START_DISTANCE)
+                self.version.append(0)
+                self.index[key] = row
+            return row
+
+    def populate(self, count, stores=100, spread=None):
+        """Place count orders across stores, with start times spread over one order lifetime."""
+        now = time.time()
+        spread = self.stage_starts[-1] if spread is None else spread
+        for i in range(count):
+            row = self.get(str(1000 + i % stores), f"SIM{i:07d}", now)
+            self.created[row] = now - random.uniform(0, spread)
+
+    def _elapsed(self, row, now):
+        return (now - self.created[row]) / self.speed[row]
+
+    def state(self, row, now=None):
+        """(status index, distance, eta, last modified) for one order."""
+        now = now or time.time()
+        elapsed = self._elapsed(row, now)
+
+        stage = len(self.stage_seconds)
+        for i, start in enumerate(self.stage_starts[1:]):
+            if elapsed < start:
+                stage = i
+                break
+
+        sent_start = self.stage_starts[SENT_INDEX]
+        sent_length = self.stage_seconds[SENT_INDEX]
+        modified = self.stage_starts[stage]
+
+        if stage < SENT_INDEX:
+            distance = self.start_distance[row]
+        elif stage == SENT_INDEX:
+            steps = int((elapsed - sent_start) // DISTANCE_STEP)
+            travelled = min(steps * DISTANCE_STEP / sent_length, 1.0)
+            distance = max(0.0, self.start_distance[row] * (1 - travelled))
+            modified = sent_start + steps * DISTANCE_STEP
+        else:
+            distance = 0.0
+
+        eta = self.created[row] + max(QUOTED_DELIVERY_SECONDS, self.stage_starts[-1] * self.speed[row])
+        last_modified = self.created[row] + modified * self.speed[row]
+        return stage, distance, eta, last_modified
+
+    def set_status(self, row, status):
+        """Move an order straight to the start of a stage."""
+        stage = STATUS_SEQUENCE.index(status)
+        self.created[row] = time.time() - self.stage_starts[stage] * self.speed[row]
+        self.version[row] += 1
+
+    def set_distance(self, row, distance):
+        """Make the driver be `distance` miles away now."""
+        stage, _, _, _ = self.state(row)
+        if stage == SENT_INDEX:
+            elapsed = self._elapsed(row, time.time()) - self.stage_starts[SENT_INDEX]
+            steps = int(elapsed // DISTANCE_STEP)
+            remaining = 1 - min(steps * DISTANCE_STEP / self.stage_seconds[SENT_INDEX], 1.0)
+            self.start_distance[row] = distance / remaining if remaining > 0 else distance
+        else:
+            self.start_distance[row] = distance
+        self.version[row] += 1
+
+    def reset(self, row):
+        self.created[row] = time.time()
+        self.start_distance[row] = START_DISTANCE
+        self.version[row] += 1
+
 
-def update_status_loop():
-    global ORDER_STATUS, DELIVERY_DISTANCE
-    
-    current_status_index = 0
-    
-    while True:
-        current_status = STATUS_SEQUENCE[current_status_index]
-        wait_time = STATUS_TIMINGS[current_status]
-        
-        if current_status == "OrderDelivered":
-            DELIVERY_DISTANCE = 0.0
-            time.sleep(10)
-            continue
-            
-        time.sleep(wait_time)
-        
-        current_status_index = min(current_status_index + 1, len(STATUS_SEQUENCE) - 1)
-        ORDER_STATUS = STATUS_SEQUENCE[current_status_index]
-        
-        if ORDER_STATUS == "OrderSent":
-            decrease_distance_thread = threading.Thread(target=decrease_distance)
-            decrease_distance_thread.daemon = True
-            decrease_distance_thread.start()
-
-def decrease_distance():
-    global DELIVERY_DISTANCE
-    
-    while DELIVERY_DISTANCE > 0:
-        DELIVERY_DISTANCE = max(0, DELIVERY_DISTANCE - random.uniform(0.1, 0.5))
-        
-        time.sleep(10) #Update every 15 sec
+FLEET = Fleet()
+
+
+def inject_faults():
+    """Apply the configured latency, errors and timeouts, returns an error response or None."""
+    if FAULTS["timeout_rate"] and random.random() < FAULTS["timeout_rate"]:
+        time.sleep(FAULTS["timeout_seconds"])
+
+    if FAULTS["latency_ms"] or FAULTS["latency_jitter_ms"]:
+        delay = FAULTS["latency_ms"] + random.uniform(-1, 1) * FAULTS["latency_jitter_ms"]
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    if FAULTS["error_rate"] and random.random() < FAULTS["error_rate"]:
+        return jsonify({"error": "Injected failure", "success": False}), 500
+    return None
+
+
+def order_row():
+    store_id = request.args.get('storeId', '') or DEFAULT_STORE_ID
+    order_key = request.args.get('orderKey', '') or DEFAULT_ORDER_KEY
+    return store_id, order_key, FLEET.get(store_id, order_key)
+
+
+def conditional_json(response, row, stage, last_modified):
+    """jsonify with an ETag/Last-Modified so unchanged orders can be answered with a 304."""
+    body = jsonify(response)
+    body.set_etag(f"{row}-{FLEET.version[row]}-{stage}-{int(last_modified)}")
+    body.last_modified = datetime.fromtimestamp(int(last_modified), timezone.utc)
+    return body.make_conditional(request)
 
 @app.route('/power/trackOrder', methods=['GET'])
 def track_dominos_order():
     """Mock Domino's Pizza tracking API."""
-    store_id = request.args.get('storeId', '')
-    order_key = request.args.get('orderKey', '')
-    
-    status = ORDER_STATUS
-    
-    eta = DELIVERY_TIME.strftime(" %I:%M %p")
-
-    order = ORDER_DESCRIPTION
+    failure = inject_faults()
+    if failure is not None:
+        return failure
+
+    store_id, order_key, row = order_row()
+    stage, distance, eta, last_modified = FLEET.state(row)
+
     response = {
         "order": {
-            "orderStatus": status,
-            "estimatedDeliveryTime": eta,
-            "deliveryDistance": str(round(DELIVERY_DISTANCE, 2)),
-            "orderDescription": order,
-            "storeId": "1234" if not store_id else store_id,
-            "orderKey": "ABCD1234" if not order_key else order_key
+            "orderStatus": STATUS_SEQUENCE[stage],
+            "estimatedDeliveryTime": time.strftime(" %I:%M %p", time.localtime(eta)),
+            "deliveryDistance": str(round(distance, 2)),
+            "orderDescription": ORDER_DESCRIPTION,
+            "storeId": store_id,
+            "orderKey": order_key
         },
         "status": 200,
         "success": True
     }
-    
-    return jsonify(response)
+
+    return conditional_json(response, row, stage, last_modified)
+
+@app.route('/api/oh-yeah/track', methods=['GET'])
+def track_pizza_hut_order():
+    """Mock Pizza Hut tracking API."""
+    failure = inject_faults()
+    if failure is not None:
+        return failure
+
+    order_id = request.args.get('orderId', '') or 'PH123456'
+    row = FLEET.get("pizza_hut", order_id)
+    stage, distance, eta, last_modified = FLEET.state(row)
+
+    return conditional_json({
+        "orderId": order_id,
+        "status": PIZZA_HUT_STATUS[STATUS_SEQUENCE[stage]],
+        "estimatedDelivery": time.strftime("%I:%M %p", time.localtime(eta)),
+        "driverDistanceMiles": round(distance, 2),
+        "items": [item.strip() for item in ORDER_DESCRIPTION.split(",")]
+    }, row, stage, last_modified)
+
+@app.route('/order/trackorder', methods=['GET'])
+def track_papa_johns_order():
+    """Mock Papa John's tracking API."""
+    failure = inject_faults()
+    if failure is not None:
+        return failure
+
+    order_number = request.args.get('orderNumber', '') or 'PJ123456'
+    row = FLEET.get("papa_johns", order_number)
+    stage, distance, eta, last_modified = FLEET.state(row)
+
+    return conditional_json({
+        "orderNumber": order_number,
+        "orderSummary": ORDER_DESCRIPTION,
+        "tracker": {
+            "stage": PAPA_JOHNS_STAGE[STATUS_SEQUENCE[stage]],
+            "eta": time.strftime("%I:%M %p", time.localtime(eta)),
+            "milesAway": round(distance, 2)
+        }
+    }, row, stage, last_modified)
 
 @app.route('/reset', methods=['GET'])
 def reset_order():
-    """Reset the order to its initial state."""
-    global ORDER_STATUS, START_TIME, DELIVERY_TIME, DELIVERY_DISTANCE
-    
-    ORDER_STATUS = "OrderPlaced"
-    START_TIME = datetime.now()
-    DELIVERY_TIME = START_TIME + timedelta(minutes=30)
-    DELIVERY_DISTANCE = 2.0
-    
+    """Reset an order (or every order with ?all=1) to its initial state."""
+    if request.args.get('all'):
+        for row in range(len(FLEET)):
+            FLEET.reset(row)
+        return jsonify({"status": f"{len(FLEET)} orders reset successfully"})
+
+    _, _, row = order_row()
+    FLEET.reset(row)
     return jsonify({"status": "Order reset successfully"})
 
 @app.route('/status', methods=['GET'])
 def get_status():
-    """Get the current order status."""
+    """Get the current status of an order."""
+    _, _, row = order_row()
+    stage, distance, eta, _ = FLEET.state(row)
     return jsonify({
-        "orderStatus": ORDER_STATUS,
-        "deliveryDistance": DELIVERY_DISTANCE,
-        "estimatedDeliveryTime": DELIVERY_TIME.strftime("%I:%M %p")
+        "orderStatus": STATUS_SEQUENCE[stage],
+        "deliveryDistance": distance,
+        "estimatedDeliveryTime": time.strftime("%I:%M %p", time.localtime(eta))
     })
 
+@app.route('/fleet', methods=['GET'])
+def get_fleet():
+    """Count the simulated orders in each status."""
+    now = time.time()
+    counts = dict.fromkeys(STATUS_SEQUENCE, 0)
+    for row in range(len(FLEET)):
+        counts[STATUS_SEQUENCE[FLEET.state(row, now)[0]]] += 1
+    return jsonify({"orders": len(FLEET), "statuses": counts, "faults": FAULTS})
+
 @app.route('/set_status', methods=['GET'])
 def set_status():
     """Manually set the order status (for testing)."""
-    global ORDER_STATUS
-    
     status = request.args.get('status', '')
     if status in STATUS_SEQUENCE:
-        ORDER_STATUS = status
+        _, _, row = order_row()
+        FLEET.set_status(row, status)
         return jsonify({"status": f"Order status set to {status}"})
     else:
         return jsonify({"error": f"Invalid status. Valid statuses are: {', '.join(STATUS_SEQUENCE)}"}), 400
@@ -119,18 +309,61 @@ def set_status():
 @app.route('/set_distance', methods=['GET'])
 def set_distance():
     """Manually set the delivery distance (for testing)."""
-    global DELIVERY_DISTANCE
-    
     try:
         distance = float(request.args.get('distance', ''))
-        DELIVERY_DISTANCE = max(0, min(distance, 5))
-        return jsonify({"status": f"Delivery distance set to {DELIVERY_DISTANCE} miles"})
-    except:
+        if math.isnan(distance):
+            raise ValueError
+    except ValueError:
         return jsonify({"error": "Invalid distance. Must be a number."}), 400
 
+    _, _, row = order_row()
+    FLEET.set_distance(row, max(0, min(distance, 5)))
+    return jsonify({"status": f"Delivery distance set to {max(0, min(distance, 5))} miles"})
+
+@app.route('/faults', methods=['GET'])
+def set_faults():
+    """Change fault injection at runtime, e.g. /faults?error_rate=0.1&latency_ms=200."""
+    try:
+        for name in FAULTS:
+            if name in request.args:
+                FAULTS[name] = max(0.0, float(request.args[name]))
+    except ValueError:
+        return jsonify({"error": "Fault settings must be numbers."}), 400
+    return jsonify(FAULTS)
+
+
+def serve(host, port, threads):
+    """Run on waitress when it is installed, Flask's threaded server otherwise."""
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        print("waitress is not installed, falling back to the Flask development server")
+        app.run(host=host, port=port, threaded=True)
+        return
+
+    print(f"Serving {len(FLEET)} orders on http://{host}:{port} with {threads} threads")
+    waitress_serve(app, host=host, port=port, threads=threads, connection_limit=max(100, threads * 8))
+
+
 if __name__ == '__main__':
-    status_thread = threading.Thread(target=update_status_loop)
-    status_thread.daemon = True
-    status_thread.start()
-    
-    app.run(host='0.0.0.0', port=5000)
+    parser = argparse.ArgumentParser(description="Simulated pizza tracking APIs for local testing")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=16, help="server worker threads")
+    parser.add_argument("--orders", type=int, default=0, help="pre-populate this many orders")
+    parser.add_argument("--stores", type=int, default=100, help="spread pre-populated orders over this many stores")
+    parser.add_argument("--stage-seconds", type=float, help="length of every stage (default: STATUS_TIMINGS)")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 500")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="fraction of requests that hang")
+    parser.add_argument("--timeout-seconds", type=float, default=30.0)
+    args = parser.parse_args()
+
+    for name in FAULTS:
+        FAULTS[name] = getattr(args, name)
+
+    FLEET = Fleet(args.stage_seconds)
+    FLEET.populate(args.orders, args.stores)
+
+    serve(args.host, args.port, args.threads)
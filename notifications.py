@@ -0,0 +1,153 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NOTIFICATION_CONFIG = {
+    "channels": 4,
+    "coalesce_window": 1.0,
+    "volume": 1.0
+}
+
+#One coalesced alert, covering every order that triggered within the window
+Notification = namedtuple("Notification", ["message", "keys"])
+
+
+class NotificationCenter:
+    """Plays the pizza sound and raises alerts without blocking anyone.
+
+    check() runs on the engine thread and only queues an event. A worker
+    thread decodes the sound once into a pygame.mixer.Sound, gathers the
+    events that arrive within coalesce_window of each other and plays the
+    sound once per burst on a small pool of reserved mixer channels.
+    """
+
+    def __init__(self, sound_file, notification_distance=0.0, channels=4, coalesce_window=1.0, volume=1.0):
+        self.sound_file = sound_file
+        self.notification_distance = notification_distance
+        self.channel_count = channels
+        self.coalesce_window = coalesce_window
+        self.volume = volume
+
+        self.sound = None
+        self.channels = []
+        self.subscribers = []
+        self.notified = set()
+
+        self._next_channel = 0
+        self._events = queue.SimpleQueue()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config):
+        settings = dict(DEFAULT_NOTIFICATION_CONFIG)
+        settings.update(config.get("notifications", {}))
+        return cls(config["sound_file"], config["notification_distance"], **settings)
+
+    def subscribe(self):
+        """Return a queue receiving a Notification for every coalesced burst."""
+        channel = queue.SimpleQueue()
+        self.subscribers.append(channel)
+        return channel
+
+    def should_notify(self, state):
+        if state.is_delivered:
+            return True
+        return (state.raw_status == "OrderSent" and state.delivery_distance is not None
+                and state.delivery_distance <= self.notification_distance)
+
+    def check(self, state):
+        """Engine listener, queues a notification the first time an order is close enough."""
+        if state.key not in self.notified and self.should_notify(state):
+            self.notified.add(state.key)
+            self._events.put(state.key)
+
+    def forget(self, key):
+        """Engine removed listener, an order tracked again later may notify again."""
+        self.notified.discard(key)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="pizza-notifications")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._events.put(None)
+
+    def preload(self):
+        """Initialise the mixer and decode the sound file once."""
+        if not os.path.exists(self.sound_file):
+            logger.warning(f"Sound file not found: {self.sound_file}")
+            return
+
+        started = time.perf_counter()
+        try:
+            os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+            import pygame
+
+            pygame.mixer.init()
+            pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), self.channel_count))
+            pygame.mixer.set_reserved(self.channel_count)
+            self.channels = [pygame.mixer.Channel(i) for i in range(self.channel_count)]
+
+            self.sound = pygame.mixer.Sound(self.sound_file)
+            self.sound.set_volume(self.volume)
+        except Exception as e:
+            logger.warning(f"Sound disabled, could not initialise audio: {e}")
+            self.sound = None
+            return
+
+        logger.info(f"Loaded {self.sound_file} in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def play(self):
+        """Start the sound on a free reserved channel, or the least recently used one."""
+        if self.sound is None or not self.channels:
+            return
+
+        for channel in self.channels:
+            if not channel.get_busy():
+                break
+        else:
+            channel = self.channels[self._next_channel]
+            self._next_channel = (self._next_channel + 1) % len(self.channels)
+
+        channel.play(self.sound)
+
+    def _run(self):
+        self.preload()
+
+        while True:
+            key = self._events.get()
+            if key is None:
+                return
+
+            #Gather everything else that arrives during the window into one alert
+            keys = [key]
+            deadline = time.monotonic() + self.coalesce_window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    key = self._events.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if key is None:
+                    self._deliver(keys)
+                    return
+                keys.append(key)
+
+            self._deliver(keys)
+
+    def _deliver(self, keys):
+        self.play()
+
+        message = "IT'S PIZZA TIME!" if len(keys) == 1 else f"IT'S PIZZA TIME! ({len(keys)} orders)"
+        notification = Notification(message, tuple(keys))
+        for channel in self.subscribers:
+            channel.put(notification)
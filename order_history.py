@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+#Stage durations are also counted in buckets of this many seconds per day,
+#which is what lets median queries skip the raw rows entirely
+BUCKET_SECONDS = 10
+
+DEFAULT_HISTORY_CONFIG = {
+    "enabled": True,
+    "path": "pizza_history.db",
+    "flush_interval": 1.0,
+    "batch_size": 500
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transitions (
+    order_key TEXT NOT NULL,
+    service TEXT NOT NULL,
+    store_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    ts REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    order_key TEXT NOT NULL,
+    service TEXT NOT NULL,
+    ts REAL NOT NULL,
+    eta TEXT,
+    distance REAL
+);
+CREATE TABLE IF NOT EXISTS stage_durations (
+    order_key TEXT NOT NULL,
+    service TEXT NOT NULL,
+    store_id TEXT NOT NULL,
+    from_status TEXT NOT NULL,
+    to_status TEXT NOT NULL,
+    ended_ts REAL NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stage_histogram (
+    from_status TEXT NOT NULL,
+    to_status TEXT NOT NULL,
+    service TEXT NOT NULL,
+    store_id TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (from_status, to_status, day, service, store_id, bucket)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS transitions_order ON transitions (order_key, ts);
+CREATE INDEX IF NOT EXISTS transitions_service ON transitions (service, ts);
+CREATE INDEX IF NOT EXISTS transitions_ts ON transitions (ts);
+CREATE INDEX IF NOT EXISTS samples_order ON samples (order_key, ts);
+CREATE INDEX IF NOT EXISTS samples_service ON samples (service, ts);
+CREATE INDEX IF NOT EXISTS stage_durations_lookup
+    ON stage_durations (from_status, to_status, ended_ts, service, store_id, duration);
+CREATE INDEX IF NOT EXISTS stage_durations_order ON stage_durations (order_key, ended_ts);
+"""
+
+
+def connect(path):
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class OrderHistory:
+    """SQLite (WAL) store of status transitions and ETA/distance samples.
+
+    record() is called from the engine thread and only queues a snapshot
+    of the order; a writer thread compares it with the previous one and
+    inserts the rows in batches. Stage durations are worked out at write
+    time, so analytics queries never have to pair up transitions. Only a
+    stage whose start was seen gets a duration: the first status of an
+    order, or one it already had before a restart, may have begun long
+    before the tracker looked.
+    """
+
+    def __init__(self, path="pizza_history.db", flush_interval=1.0, batch_size=500):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._events = queue.SimpleQueue()
+        self._last = {}
+        self._thread = None
+        self._running = False
+        self._writer = connect(path)
+
+    @classmethod
+    def from_config(cls, config):
+        settings = dict(DEFAULT_HISTORY_CONFIG)
+        settings.update(config.get("history", {}))
+        settings.pop("enabled")
+        return cls(**settings)
+
+    def record(self, state, now=None):
+        """Engine listener, queues the order as it is now."""
+        if state.raw_status is None:
+            return
+        self._events.put((
+            "check", state.key, state.service, str(state.params.get("store_id", "")),
+            state.raw_status, state.delivery_eta, state.delivery_distance, now or time.time()
+        ))
+
+    def forget(self, key):
+        """Engine removed listener, drops what is kept in memory about an order."""
+        self._events.put(("forget", key))
+
+    def _restore(self, keys):
+        """Last recorded status and sample of each key, so a restart does not record them again."""
+        restored = {key: (None, None, False, None, None) for key in keys}
+        keys = list(keys)
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            marks = ", ".join("?" * len(chunk))
+            #SQLite takes the bare columns from the row holding the MAX()
+            transitions = {key: (status, ts) for key, status, ts in self._writer.execute(
+                f"SELECT order_key, status, MAX(ts) FROM transitions WHERE order_key IN ({marks}) GROUP BY order_key", chunk
+            )}
+            stages = {key: (status, ts) for key, status, ts in self._writer.execute(
+                f"SELECT order_key, to_status, MAX(ended_ts) FROM stage_durations WHERE order_key IN ({marks}) "
+                "GROUP BY order_key", chunk
+            )}
+            samples = {key: (eta, distance) for key, eta, distance, _ in self._writer.execute(
+                f"SELECT order_key, eta, distance, MAX(ts) FROM samples WHERE order_key IN ({marks}) GROUP BY order_key",
+                chunk
+            )}
+            for key in chunk:
+                status, since = transitions.get(key, (None, None))
+                #A stage that ended at that transition means the change was seen as it happened
+                saw_start = status is not None and stages.get(key) == (status, since)
+                eta, distance = samples.get(key, (None, None))
+                restored[key] = (status, since, saw_start, eta, distance)
+        return restored
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._write_loop, name="pizza-history")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def _write_loop(self):
+        while self._running:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Turn every queued snapshot into rows and insert them, one transaction per batch."""
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                break
+        if not events:
+            return
+
+        #Orders seen for the first time since starting are looked up together
+        restored = self._restore({event[1] for event in events if event[0] == "check" and event[1] not in self._last})
+
+        batches = {"transition": [], "sample": [], "stage": []}
+        pending = 0
+        for event in events:
+            if event[0] == "forget":
+                self._last.pop(event[1], None)
+                restored.pop(event[1], None)
+                continue
+
+            _, key, service, store_id, raw_status, delivery_eta, delivery_distance, now = event
+            last = self._last.get(key)
+            #A change from a status restored after a restart may have happened any time while it was down
+            seen = last is not None
+            if last is None and key in restored:
+                last = restored.pop(key)
+            elif last is None:
+                #Forgotten and added back within this flush, its earlier rows have to be written first
+                if pending:
+                    self._insert(batches)
+                    batches = {"transition": [], "sample": [], "stage": []}
+                    pending = 0
+                last = self._restore([key])[key]
+            status, since, saw_start, eta, distance = last
+
+            if raw_status != status:
+                batches["transition"].append((key, service, store_id, raw_status, now))
+                if saw_start and seen:
+                    batches["stage"].append((key, service, store_id, status, raw_status, now, now - since))
+                    pending += 1
+                saw_start = status is not None and seen
+                status, since = raw_status, now
+                pending += 1
+
+            if delivery_eta != eta or delivery_distance != distance:
+                batches["sample"].append((key, service, now, delivery_eta, delivery_distance))
+                eta, distance = delivery_eta, delivery_distance
+                pending += 1
+
+            self._last[key] = (status, since, saw_start, eta, distance)
+
+            if pending >= self.batch_size:
+                self._insert(batches)
+                batches = {"transition": [], "sample": [], "stage": []}
+                pending = 0
+
+        if pending:
+            self._insert(batches)
+
+    def _insert(self, batches):
+        with self._writer:
+            self._writer.executemany("INSERT INTO transitions VALUES (?, ?, ?, ?, ?)", batches["transition"])
+            self._writer.executemany("INSERT INTO samples VALUES (?, ?, ?, ?, ?)", batches["sample"])
+            self._writer.executemany("INSERT INTO stage_durations VALUES (?, ?, ?, ?, ?, ?, ?)", batches["stage"])
+            self._writer.executemany(
+                "INSERT INTO stage_histogram VALUES (?, ?, ?, ?, ?, ?, 1) "
+                "ON CONFLICT DO UPDATE SET count = count + 1",
+                [
+                    (from_status, to_status, service, store_id, int(ended_ts // 86400), int(duration // BUCKET_SECONDS))
+                    for _, service, store_id, from_status, to_status, ended_ts, duration in batches["stage"]
+                ]
+            )
+
+    def close(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+        self._writer.close()
+
+
+class HistoryQuery:
+    """Read side of the history store, safe to use while the tracker is writing."""
+
+    def __init__(self, path="pizza_history.db"):
+        self.connection = connect(path)
+
+    def stage_durations(self, from_status, to_status, days=30, service=None, now=None):
+        """Return {(service, store_id): [durations]} for one stage over the last `days` days."""
+        since = (now or time.time()) - days * 86400
+        sql = ("SELECT service, store_id, duration FROM stage_durations "
+               "WHERE from_status = ? AND to_status = ? AND ended_ts >= ?")
+        args = [from_status, to_status, since]
+        if service:
+            sql += " AND service = ?"
+            args.append(service)
+
+        durations = {}
+        for row_service, store_id, duration in self.connection.execute(sql, args):
+            durations.setdefault((row_service, store_id), []).append(duration)
+        return durations
+
+    def median_stage_time(self, from_status, to_status, days=30, service=None, now=None):
+        """Return {(service, store_id): (median seconds, count)}.
+
+        Answered from the per-day histogram, so the window is rounded to
+        whole days and the median to BUCKET_SECONDS.
+        """
+        since_day = int(((now or time.time()) - days * 86400) // 86400)
+        sql = ("SELECT service, store_id, bucket, SUM(count) FROM stage_histogram "
+               "WHERE from_status = ? AND to_status = ? AND day >= ?")
+        args = [from_status, to_status, since_day]
+        if service:
+            sql += " AND service = ?"
+            args.append(service)
+        sql += " GROUP BY service, store_id, bucket ORDER BY service, store_id, bucket"
+
+        buckets = {}
+        for row_service, store_id, bucket, count in self.connection.execute(sql, args):
+            buckets.setdefault((row_service, store_id), []).append((bucket, count))
+
+        medians = {}
+        for store, counts in buckets.items():
+            total = sum(count for _, count in counts)
+            seen = 0
+            for bucket, count in counts:
+                seen += count
+                if seen * 2 >= total:
+                    medians[store] = ((bucket + 0.5) * BUCKET_SECONDS, total)
+                    break
+        return medians
+
+    def order_timeline(self, order_key):
+        """Return [(ts, status)] for every recorded transition of one order."""
+        return self.connection.execute(
+            "SELECT ts, status FROM transitions WHERE order_key = ? ORDER BY ts", (order_key,)
+        ).fetchall()
+
+    def order_samples(self, order_key):
+        """Return [(ts, eta, distance)] for one order."""
+        return self.connection.execute(
+            "SELECT ts, eta, distance FROM samples WHERE order_key = ? ORDER BY ts", (order_key,)
+        ).fetchall()
+
+    def close(self):
+        self.connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the pizza order history")
+    parser.add_argument("--db", default=DEFAULT_HISTORY_CONFIG["path"], help="history database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    stage = commands.add_parser("stage-time", help="median time between two statuses per store")
+    stage.add_argument("--from", dest="from_status", default="OrderBaking")
+    stage.add_argument("--to", dest="to_status", default="OrderSent")
+    stage.add_argument("--days", type=float, default=30)
+    stage.add_argument("--service")
+
+    timeline = commands.add_parser("order", help="transitions and samples of one order")
+    timeline.add_argument("order_key", help="e.g. dominos:1234/ABCD1234")
+
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No history database at {args.db}", file=sys.stderr)
+        return 1
+
+    history = HistoryQuery(args.db)
+    started = time.perf_counter()
+
+    if args.command == "stage-time":
+        medians = history.median_stage_time(args.from_status, args.to_status, args.days, args.service)
+        print(f"{args.from_status} -> {args.to_status}, last {args.days:g} days")
+        for (service, store_id), (median, count) in sorted(medians.items()):
+            print(f"  {service:<12} store {store_id or '-':<8} median {median / 60:6.1f} min  ({count} orders)")
+        if not medians:
+            print("  no data")
+
+    elif args.command == "order":
+        for ts, status in history.order_timeline(args.order_key):
+            print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))}  {status}")
+        for ts, eta, distance in history.order_samples(args.order_key):
+            print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))}  eta={eta} distance={distance}")
+
+    print(f"({(time.perf_counter() - started) * 1000:.1f} ms)")
+    history.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
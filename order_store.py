@@ -0,0 +1,169 @@
+import math
+import threading
+from array import array
+from itertools import compress
+
+#Canonical statuses as small ints, 0 is "no status yet"
+STATUSES = (None, "OrderPlaced", "OrderMaking", "OrderBaking", "OrderSent", "OrderDelivered")
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+#Bits in the flags column
+DELIVERED = 1
+DISTANCE_FALLING = 2
+LIVE = 4
+
+NAN = float("nan")
+
+
+def _numpy():
+    """numpy if it is installed, bulk queries fall back to plain loops without it."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class OrderStore:
+    """Column store holding the numeric state of many orders.
+
+    Each order owns one row across a set of typed arrays: statuses as small
+    int codes, times as epoch floats and distances as floats with NaN for
+    unknown. Rows of dropped orders are reused. Bulk queries scan whole
+    columns, with numpy when it is available, instead of touching one
+    Python object per order.
+    """
+
+    def __init__(self):
+        self.status = array("b")
+        self.progress = array("b")
+        self.predicted_progress = array("b")
+        self.flags = array("B")
+        self.services = array("B")
+        self.checks = array("I")
+        self.failures = array("I")
+        self.distance = array("d")
+        self.updated = array("d")
+        self.latency = array("d")
+
+        self.service_names = []
+        self.service_codes = {}
+        self.keys = []
+        self._free = []
+        #Reentrant, so a release triggered while this thread already holds it can't deadlock
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.keys) - len(self._free)
+
+    def service_code(self, service):
+        code = self.service_codes.get(service)
+        if code is None:
+            code = self.service_codes[service] = len(self.service_names)
+            self.service_names.append(service)
+        return code
+
+    def allocate(self, key, service):
+        """Return a fresh row for key, reusing a released one when possible."""
+        with self._lock:
+            code = self.service_code(service)
+            if self._free:
+                row = self._free.pop()
+                self.keys[row] = key
+                self.services[row] = code
+                self.clear(row)
+                return row
+
+            self.keys.append(key)
+            self.services.append(code)
+            for column in (self.status, self.progress, self.predicted_progress, self.checks, self.failures):
+                column.append(0)
+            for column in (self.distance, self.updated, self.latency):
+                column.append(NAN)
+            self.flags.append(LIVE)
+            return len(self.keys) - 1
+
+    def clear(self, row):
+        self.status[row] = self.progress[row] = self.predicted_progress[row] = 0
+        self.flags[row] = LIVE
+        self.checks[row] = self.failures[row] = 0
+        self.distance[row] = self.updated[row] = self.latency[row] = NAN
+
+    def release(self, row):
+        with self._lock:
+            self.keys[row] = None
+            self.status[row] = self.flags[row] = 0
+            self._free.append(row)
+
+    def copy_row(self, other, row, into):
+        """Copy one row of another store into row `into` of this one."""
+        for name in ("status", "progress", "predicted_progress", "flags", "checks", "failures", "distance", "updated", "latency"):
+            getattr(self, name)[into] = getattr(other, name)[row]
+        self.flags[into] |= LIVE
+
+    def select(self, status=None, max_distance=None, service=None, delivered=None):
+        """Keys of every order matching all the given conditions.
+
+        e.g. select(status="OrderSent", max_distance=0.5)
+        """
+        with self._lock:
+            if not self.keys:
+                return []
+
+            numpy = _numpy()
+            if numpy is not None:
+                rows = self._select_numpy(numpy, status, max_distance, service, delivered)
+            else:
+                rows = self._select_python(status, max_distance, service, delivered)
+            return [self.keys[row] for row in rows]
+
+    def _select_numpy(self, numpy, status, max_distance, service, delivered):
+        #Views straight onto the arrays' buffers, nothing is copied
+        flags = numpy.frombuffer(self.flags, dtype=numpy.uint8)
+        mask = (flags & LIVE) != 0
+        if status is not None:
+            mask &= numpy.frombuffer(self.status, dtype=numpy.int8) == STATUS_CODES[status]
+        if max_distance is not None:
+            mask &= numpy.frombuffer(self.distance, dtype=numpy.float64) <= max_distance
+        if service is not None:
+            mask &= numpy.frombuffer(self.services, dtype=numpy.uint8) == self.service_codes.get(service, -1)
+        if delivered is not None:
+            delivered_rows = (flags & DELIVERED) != 0
+            mask &= delivered_rows if delivered else ~delivered_rows
+        return numpy.flatnonzero(mask).tolist()
+
+    def _select_python(self, status, max_distance, service, delivered):
+        if status is not None:
+            code = STATUS_CODES[status]
+            rows = list(compress(range(len(self.keys)), [value == code for value in self.status]))
+        else:
+            rows = list(compress(range(len(self.keys)), [flag & LIVE for flag in self.flags]))
+
+        if max_distance is not None:
+            distance = self.distance
+            rows = [row for row in rows if distance[row] <= max_distance]
+        if service is not None:
+            code = self.service_codes.get(service, -1)
+            services = self.services
+            rows = [row for row in rows if services[row] == code]
+        if delivered is not None:
+            flags = self.flags
+            rows = [row for row in rows if bool(flags[row] & DELIVERED) == delivered]
+        return rows
+
+    def count_by_status(self):
+        """{status: number of orders} over every tracked order with a status."""
+        with self._lock:
+            numpy = _numpy()
+            if numpy is not None:
+                counts = numpy.bincount(numpy.frombuffer(self.status, dtype=numpy.int8), minlength=len(STATUSES)).tolist()
+            else:
+                counts = [0] * len(STATUSES)
+                for code in self.status:
+                    counts[code] += 1
+            return {status: counts[code] for code, status in enumerate(STATUSES) if code and counts[code]}
+
+
+def optional(value):
+    """NaN columns read back as None."""
+    return None if math.isnan(value) else value
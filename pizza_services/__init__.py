@@ -0,0 +1,58 @@
+import importlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+#Third-party adapters can register themselves under this entry point group
+ENTRY_POINT_GROUP = "pizza_tracker.services"
+
+#Built-in adapters, imported only when a service actually needs them
+BUILTIN_ADAPTERS = {
+    "dominos": "pizza_services.dominos:DominosAdapter",
+    "pizza_hut": "pizza_services.pizza_hut:PizzaHutAdapter",
+    "papa_johns": "pizza_services.papa_johns:PapaJohnsAdapter"
+}
+
+_loaded = {}
+
+
+def _entry_point_target(service):
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return None
+
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        if entry_point.name == service:
+            return entry_point.value
+    return None
+
+
+def get_adapter_class(service):
+    """Import and return the adapter class for a service, or None if there is none."""
+    if service in _loaded:
+        return _loaded[service]
+
+    target = BUILTIN_ADAPTERS.get(service) or _entry_point_target(service)
+    adapter_class = None
+
+    if target is not None:
+        module_name, _, class_name = target.partition(":")
+        try:
+            adapter_class = getattr(importlib.import_module(module_name), class_name)
+        except (ImportError, AttributeError) as e:
+            logger.error(f"Could not load adapter for {service}: {e}")
+
+    _loaded[service] = adapter_class
+    return adapter_class
+
+
+def available_services():
+    """Names of every service an adapter is known for, without importing any of them."""
+    names = set(BUILTIN_ADAPTERS)
+    try:
+        from importlib.metadata import entry_points
+        names.update(entry_point.name for entry_point in entry_points(group=ENTRY_POINT_GROUP))
+    except ImportError:
+        pass
+    return sorted(names)
@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import metrics
+
+
+class RateLimiter:
+    """Allows `rate` requests per second with bursts of `burst`.
+
+    Every caller reserves the next free slot in arrival order and sleeps
+    once until it comes up, so thousands of waiting orders cost no CPU
+    while they wait.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.next_free = 0.0
+
+    async def acquire(self):
+        now = time.monotonic()
+        #After an idle spell up to `burst` requests may go out back to back
+        slot = max(now - (self.burst - 1) / self.rate, self.next_free)
+        self.next_free = slot + 1 / self.rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class ServiceAdapter:
+    """Common interface every pizza service adapter implements.
+
+    Subclasses set `name`, `key_params` and a module-level STATUS_TABLE that
+    maps the provider's status codes onto (canonical status, text, progress),
+    where the canonical statuses are the Domino's ones (OrderPlaced ...
+    OrderDelivered) that the scheduler understands. They then implement
+    build_request() and parse().
+    """
+
+    name = None
+    key_params = ()
+    status_table = {}
+
+    #SessionRecorder the engine hands raw responses to, if it records
+    recorder = None
+
+    def __init__(self, service_config, transport, executor=None):
+        self.service_config = service_config
+        self.transport = transport
+        self.executor = executor
+
+        rate = service_config.get("rate_limit")
+        self.limiter = RateLimiter(rate) if rate else None
+
+    async def throttle(self):
+        """Wait until this service's rate limit allows another request."""
+        if self.limiter is not None:
+            await self.limiter.acquire()
+
+    async def fetch(self, order):
+        """Fetch and parse the current status of order without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.check, order.params)
+
+    def check(self, params):
+        """Blocking fetch and parse, runs on an executor thread."""
+        url, query = self.build_request(params)
+        try:
+            data, changed = self.transport.get_json(url, query)
+        except Exception as e:
+            if self.recorder is not None:
+                self.recorder.record(self.name, params, error=e)
+            raise
+
+        if self.recorder is not None:
+            self.recorder.record(self.name, params, data if changed else None)
+        if not changed:
+            return {"not_modified": True}
+
+        started = time.perf_counter()
+        result = self.parse(data)
+        metrics.PARSE_SECONDS.labels(self.name).observe(time.perf_counter() - started)
+        return result
+
+    def build_request(self, params):
+        """Return (url, query params) for one order."""
+        raise NotImplementedError
+
+    def parse(self, data):
+        """Turn a decoded response into the result dict OrderState.apply() takes."""
+        raise NotImplementedError
+
+    def result_for(self, code, eta=None, description=None, distance=None):
+        """Build a result dict from a provider status code using status_table."""
+        entry = self.status_table.get(code)
+        if entry is None:
+            raw_status, text, progress = None, f"Status: {code}", 0
+        else:
+            raw_status, text, progress = entry
+
+        result = {
+            "raw_status": raw_status,
+            "status": text,
+            "progress": progress,
+            "eta": eta,
+            "description": description,
+            "delivered": raw_status == "OrderDelivered"
+        }
+
+        if distance is not None:
+            try:
+                result["distance"] = float(distance)
+            except (TypeError, ValueError):
+                pass
+
+        return result
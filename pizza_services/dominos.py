@@ -0,0 +1,32 @@
+from pizza_services.base import ServiceAdapter
+
+#Domino's codes are the canonical statuses: (canonical status, text, progress)
+STATUS_TABLE = {
+    "OrderPlaced": ("OrderPlaced", "Order received", 20),
+    "OrderMaking": ("OrderMaking", "Making your pizza", 40),
+    "OrderBaking": ("OrderBaking", "Baking your pizza", 60),
+    "OrderSent": ("OrderSent", "Pizza is on its way!", 80),
+    "OrderDelivered": ("OrderDelivered", "Pizza delivered!", 100)
+}
+
+
+class DominosAdapter(ServiceAdapter):
+    name = "dominos"
+    key_params = ("store_id", "order_key")
+    status_table = STATUS_TABLE
+
+    def build_request(self, params):
+        return self.service_config["base_url"], {"storeId": params["store_id"], "orderKey": params["order_key"]}
+
+    def parse(self, data):
+        #Parse the Domino's status response
+        if 'order' not in data or 'orderStatus' not in data['order']:
+            raise RuntimeError("Response did not contain an order status")
+
+        order = data['order']
+        return self.result_for(
+            order['orderStatus'],
+            eta=order.get('estimatedDeliveryTime'),
+            description=order.get('orderDescription'),
+            distance=order.get('deliveryDistance')
+        )
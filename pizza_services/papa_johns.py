@@ -0,0 +1,30 @@
+from pizza_services.base import ServiceAdapter
+
+STATUS_TABLE = {
+    "placed": ("OrderPlaced", "Order received", 20),
+    "prep": ("OrderMaking", "Making your pizza", 40),
+    "oven": ("OrderBaking", "Baking your pizza", 60),
+    "out": ("OrderSent", "Pizza is on its way!", 80),
+    "delivered": ("OrderDelivered", "Pizza delivered!", 100)
+}
+
+
+class PapaJohnsAdapter(ServiceAdapter):
+    name = "papa_johns"
+    key_params = ("order_number",)
+    status_table = STATUS_TABLE
+
+    def build_request(self, params):
+        return self.service_config["base_url"], {"orderNumber": params["order_number"]}
+
+    def parse(self, data):
+        tracker = data.get("tracker") or {}
+        if "stage" not in tracker:
+            raise RuntimeError("Response did not contain an order status")
+
+        return self.result_for(
+            tracker["stage"],
+            eta=tracker.get("eta"),
+            description=data.get("orderSummary"),
+            distance=tracker.get("milesAway")
+        )
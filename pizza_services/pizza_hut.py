@@ -0,0 +1,30 @@
+from pizza_services.base import ServiceAdapter
+
+STATUS_TABLE = {
+    "RECEIVED": ("OrderPlaced", "Order received", 20),
+    "PREPARING": ("OrderMaking", "Making your pizza", 40),
+    "IN_OVEN": ("OrderBaking", "Baking your pizza", 60),
+    "OUT_FOR_DELIVERY": ("OrderSent", "Pizza is on its way!", 80),
+    "DELIVERED": ("OrderDelivered", "Pizza delivered!", 100)
+}
+
+
+class PizzaHutAdapter(ServiceAdapter):
+    name = "pizza_hut"
+    key_params = ("order_id",)
+    status_table = STATUS_TABLE
+
+    def build_request(self, params):
+        return self.service_config["base_url"], {"orderId": params["order_id"]}
+
+    def parse(self, data):
+        if "status" not in data:
+            raise RuntimeError("Response did not contain an order status")
+
+        items = data.get("items") or []
+        return self.result_for(
+            data["status"],
+            eta=data.get("estimatedDelivery"),
+            description=", ".join(items) if items else None,
+            distance=data.get("driverDistanceMiles")
+        )
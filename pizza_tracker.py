@@ -1,24 +1,68 @@
 #!/usr/bin/env python3
-import requests
 import time
+
+#Taken before the other imports so --profile-startup can report them
+STARTUP_TIME = time.perf_counter()
+
+import argparse
+import copy
 import json
 import os
-import threading
+import queue
 import logging
 import curses
-import pygame
-from datetime import datetime
+import signal
+import sys
+import threading
+
+import metrics
+from config_loader import ConfigWatcher, load_file
+from dashboard import DashboardView, OrderTable
+from event_log import EventLog, capture_logging
+from notifications import NotificationCenter
+from order_history import OrderHistory
+from response_cache import ResponseCache
+from tracking_engine import OrderRemoved, OrderState, TrackingEngine, key_params_for
 
 #Setup logging for debugging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
+class StartupProfile:
+    """Collects named timing marks measured from STARTUP_TIME."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.marks = [("imports", time.perf_counter() - STARTUP_TIME)]
+
+    def mark(self, name):
+        if self.enabled and all(name != existing for existing, _ in self.marks):
+            self.marks.append((name, time.perf_counter() - STARTUP_TIME))
+
+    def report(self, stream=sys.stderr):
+        if not self.enabled:
+            return
+        print("Startup profile (seconds since launch):", file=stream)
+        for name, elapsed in self.marks:
+            print(f"  {name:<20} {elapsed * 1000:8.1f} ms", file=stream)
+
+
+PROFILE = StartupProfile()
+
 CONFIG = {
     "check_interval": 10,
+    "schedule": {
+        "slow_interval": 30,
+        "fast_interval": 3,
+        "max_backoff": 300,
+        "jitter": 0.1
+    },
     "pizza_services": {
         "dominos": {
             "enabled": True,
             "base_url": "https://order.dominos.com/power/trackOrder",
+            "rate_limit": 20,
             "tracking_params": {
                 "store_id": "",
                 "order_key": ""
@@ -27,6 +71,7 @@ CONFIG = {
         "pizza_hut": {
             "enabled": False,
             "base_url": "https://www.pizzahut.com/api/oh-yeah/track",
+            "rate_limit": 20,
             "tracking_params": {
                 "order_id": ""
             }
@@ -34,33 +79,101 @@ CONFIG = {
         "papa_johns": {
             "enabled": False,
             "base_url": "https://www.papajohns.com/order/trackorder",
+            "rate_limit": 20,
             "tracking_params": {
                 "order_number": ""
             }
         }
     },
+    "orders": [],
+    "max_in_flight": 32,
+    "http": {
+        "connect_timeout": 3.05,
+        "read_timeout": 10
+    },
+    "event_log": {
+        "path": "events.jsonl",
+        "max_bytes": 5242880,
+        "max_age": 86400,
+        "backups": 5,
+        "flush_interval": 1.0
+    },
+    "history": {
+        "enabled": True,
+        "path": "pizza_history.db"
+    },
+    "notifications": {
+        "channels": 4,
+        "coalesce_window": 1.0,
+        "volume": 1.0
+    },
+    "api": {
+        "host": "127.0.0.1",
+        "port": 8765
+    },
+    "cache": {
+        "enabled": True,
+        "path": "pizza_cache.json",
+        "max_entries": 10000
+    },
+    "circuit_breaker": {
+        "window": 30,
+        "min_requests": 5,
+        "failure_rate": 0.5,
+        "open_seconds": 30
+    },
+    "sharding": {
+        "workers": 0,
+        "flush_interval": 0.05,
+        "restart_delay": 1.0
+    },
     "notification_distance": 0.0,
     "sound_file": "pizza_time.wav"
 }
 
 class PizzaTrackerTerminal:
-    def __init__(self, stdscr):
+    #Row offsets inside the main box
+    ORDER_ROW = 6
+    STATUS_ROW = 9
+    ETA_ROW = 11
+    PREDICTED_ROW = 12
+    PROGRESS_ROW = 15
+    STATS_ROW = 17
+    BAR_WIDTH = 40
+
+    def __init__(self, stdscr, engine, notifications=None, show_stats=False):
         self.stdscr = stdscr
-        self.current_status = "Waiting for order info"
-        self.delivery_eta = None
-        self.is_delivered = False
-        self.notification_played = False
-        self.last_update_time = None
-        self.progress = 0
-        self.current_order = "Getting Order Info"
-
-
+        self.engine = engine
+        self.alert = None
+        self.dirty = True
+        self.show_stats = show_stats
+        self.stats_updated = 0
+
+        #The detail view shows one order, the first tracked one to start with
+        orders = list(engine.orders.values())
+        placeholder = orders[0] if orders else OrderState("dominos", {})
+        self.order_key = placeholder.key
+        self.order = placeholder.snapshot()
+
+        #More than one order opens on the dashboard table instead
+        self.table = OrderTable()
+        self.dashboard = DashboardView(stdscr, self.table)
+        self.view = "table" if len(orders) > 1 else "detail"
+
+        #Pollers publish snapshots here, this class is the only consumer
+        self.updates = engine.subscribe()
+        self.alerts = notifications.subscribe() if notifications is not None else None
 
         curses.curs_set(0)  #Hide cursor
         curses.start_color()
         curses.use_default_colors()
 
-        self.stdscr.nodelay(True)
+        #Block on input for up to the timeout instead of spinning with nodelay
+        self.stdscr.timeout(250)
+        self.stdscr.keypad(True)
+
+        #Esc leaves the detail view, don't wait a second for an escape sequence
+        curses.set_escdelay(25)
         
         curses.init_pair(1, curses.COLOR_BLUE, -1)  #Blue
         curses.init_pair(2, curses.COLOR_GREEN, -1)  #Green
@@ -69,275 +182,297 @@ class PizzaTrackerTerminal:
         curses.init_pair(5, curses.COLOR_WHITE, curses.COLOR_CYAN)  #Progress Bar
         curses.init_pair(6, curses.COLOR_RED, -1) #Red
 
-        self.height, self.width = stdscr.getmaxyx()
+        self.box = None
+        self.fields = {}
+        self.layout()
         
         self.running = True
-        self.tracking_thread = threading.Thread(target=self.tracking_loop)
-        self.tracking_thread.daemon = True
-        self.tracking_thread.start()
     
-    def draw_box(self, y, x, height, width):
-        self.stdscr.addstr(y, x, "┌" + "─" * (width - 2) + "┐")
+    def draw_box(self, win, y, x, height, width):
+        win.addstr(y, x, "┌" + "─" * (width - 2) + "┐")
         
         for i in range(1, height - 1):
-            self.stdscr.addstr(y + i, x, "│")
-            self.stdscr.addstr(y + i, x + width - 1, "│")
-    
-        self.stdscr.addstr(y + height - 1, x, "└" + "─" * (width - 2) + "┘")
+            win.addstr(y + i, x, "│")
+            win.addstr(y + i, x + width - 1, "│")
     
-    def draw_horizontal_line(self, y, x, width):
-        self.stdscr.addstr(y, x, "├" + "─" * (width - 2) + "┤")
+        win.addstr(y + height - 1, x, "└" + "─" * (width - 2) + "┘")
     
-    def update_display(self):
+    def draw_horizontal_line(self, win, y, x, width):
+        win.addstr(y, x, "├" + "─" * (width - 2) + "┤")
+
+    def layout(self):
+        """Draw the static parts of the screen, on start and on KEY_RESIZE."""
+        self.fields = {}
+        self.dirty = True
+
         try:
-            #Clear screen
-            self.stdscr.clear()
-            
-            #Get new terminal size
             self.height, self.width = self.stdscr.getmaxyx()
-            
-            #Draw main box
-            box_width = min(60, self.width - 4)
-            box_height = min(22, self.height - 2)
-            start_x = (self.width - box_width) // 2
-            start_y = (self.height - box_height) // 2
-            
-            self.draw_box(start_y, start_x, box_height, box_width)
+            self.stdscr.erase()
+            self.stdscr.noutrefresh()
+
+            if self.view == "table":
+                self.box = None
+                self.dashboard.layout(self.height, self.width)
+                return
+
+            #Main box plus the hint line under it
+            self.box_width = min(60, self.width - 4)
+            self.box_height = min(22, self.height - 2)
+            start_x = (self.width - self.box_width) // 2
+            start_y = (self.height - self.box_height) // 2
+
+            self.box = curses.newwin(self.box_height + 1, self.box_width, start_y, start_x)
+            box = self.box
+
+            self.draw_box(box, 0, 0, self.box_height, self.box_width)
             
             #Draw title
             title = "  Pizza Tracker  "
-            title_x = start_x + (box_width - len(title)) // 2
-            self.stdscr.addstr(start_y + 2, title_x, title, curses.color_pair(3))
+            box.addstr(2, (self.box_width - len(title)) // 2, title, curses.color_pair(3))
             
             # Draw horizontal line
-            self.draw_horizontal_line(start_y + 4, start_x, box_width)
-
-            #Draw Order label and Order
-            self.stdscr.addstr(start_y + 5, start_x + 2, "Order: ", curses.A_BOLD)
-            self.stdscr.addstr(start_y + 6, start_x + 2, self.current_order, curses.color_pair(6))
+            self.draw_horizontal_line(box, 4, 0, self.box_width)
 
+            #Draw labels
+            box.addstr(5, 2, "Order: ", curses.A_BOLD)
+            box.addstr(8, 2, "Current Status:", curses.A_BOLD)
+            box.addstr(14, 2, "Delivery Progress:", curses.A_BOLD)
             
-            #Draw Status label and Status
-            self.stdscr.addstr(start_y + 8, start_x + 2, "Current Status:", curses.A_BOLD)
-            self.stdscr.addstr(start_y + 9, start_x + 2, self.current_status, curses.color_pair(1))
+            hint = "Press q to exit, s for stats" + (", Esc for all orders" if len(self.table.snapshots) > 1 else "")
+            box.addstr(self.box_height, 0, hint[:self.box_width - 1], curses.A_DIM)
+
+        except curses.error:
+            self.box = None
+
+        finally:
+            if self.alert is not None:
+                self.alert = self.build_alert(self.alert_message)
+
+    def draw_field(self, name, y, x, text, attr=0):
+        """Write text at (y, x) only if it differs from what is already there."""
+        previous = self.fields.get(name)
+        if previous == (text, attr):
+            return
+
+        #Blank out whatever was longer in the previous value
+        width = len(previous[0]) if previous else 0
+        self.box.addstr(y, x, text.ljust(width), attr)
+        self.fields[name] = (text, attr)
+
+    def update_display(self):
+        if self.view == "table":
+            return self.update_table()
+
+        order = self.order
+
+        if self.box is None:
+            return
+
+        started = time.perf_counter()
+        try:
+            usable = self.box_width - 4
+
+            #Draw Order and Status
+            self.draw_field("order", self.ORDER_ROW, 2, order.current_order[:usable], curses.color_pair(6))
+            self.draw_field("status", self.STATUS_ROW, 2, order.current_status[:usable], curses.color_pair(1))
             
             #Draw ETA if available
-            if self.delivery_eta:
-                self.stdscr.addstr(start_y + 11, start_x + 2, "Estimated Delivery Time: ", curses.A_BOLD)
-                self.stdscr.addstr(start_y + 11, start_x + 26, self.delivery_eta, curses.color_pair(2))
+            if order.delivery_eta:
+                self.draw_field("eta_label", self.ETA_ROW, 2, "Estimated Delivery Time: ", curses.A_BOLD)
+                self.draw_field("eta", self.ETA_ROW, 26, order.delivery_eta, curses.color_pair(2))
+
+            #Our own estimate next to the provider's
+            if order.predicted_eta:
+                self.draw_field("predicted_label", self.PREDICTED_ROW, 2, "Predicted Delivery Time: ", curses.A_BOLD)
+                self.draw_field("predicted", self.PREDICTED_ROW, 26, order.predicted_eta, curses.color_pair(4))
             
-            #Draw progress bar label
-            self.stdscr.addstr(start_y + 14, start_x + 2, "Delivery Progress:", curses.A_BOLD)
-            
-            #Draw progress bar
-            bar_width = 40
-            filled_width = int(bar_width * (self.progress / 100))
-            
-            #Draw the filled part
-            progress_bar = "█" * filled_width + "░" * (bar_width - filled_width)
-            self.stdscr.addstr(start_y + 15, start_x + 2, progress_bar)
+            #Draw progress bar, smoothed between stages by the estimator
+            progress = max(order.progress, order.predicted_progress)
+            filled_width = int(self.BAR_WIDTH * (progress / 100))
+            progress_bar = "█" * filled_width + "░" * (self.BAR_WIDTH - filled_width)
+            self.draw_field("progress_bar", self.PROGRESS_ROW, 2, progress_bar)
             
             #Draw progress percentage
-            self.stdscr.addstr(start_y + 15, start_x + bar_width + 4, f"{self.progress}%")
-            
-            if self.last_update_time:
-                update_text = f"Last Updated: {self.last_update_time.strftime('%I:%M %p')}"
-                self.stdscr.addstr(start_y + box_height - 2, 
-                                 start_x + box_width - len(update_text) - 2,
-                                 update_text)
+            self.draw_field("progress", self.PROGRESS_ROW, self.BAR_WIDTH + 4, f"{progress}%")
             
-            self.stdscr.addstr(start_y + box_height, start_x, "Press q to exit", curses.A_DIM)
+            if order.last_update_time:
+                update_text = f"Last Updated: {order.last_update_time.strftime('%I:%M %p')}"
+                self.draw_field("updated", self.box_height - 2, self.box_width - len(update_text) - 2, update_text)
+
+            if self.show_stats:
+                self.draw_stats(usable)
             
-            self.stdscr.refresh()
+            self.box.noutrefresh()
+
+            #Keep the alert on top of the box
+            if self.alert is not None:
+                self.alert.touchwin()
+                self.alert.noutrefresh()
+
+            curses.doupdate()
             
         except curses.error:
             pass
-    
-    def show_alert(self, message):
+
+        metrics.RENDER_SECONDS.observe(time.perf_counter() - started)
+
+    def update_table(self):
+        started = time.perf_counter()
         try:
-            self.stdscr.clear()
-            self.stdscr.refresh()
+            self.dashboard.draw()
 
+            if self.alert is not None:
+                self.alert.touchwin()
+                self.alert.noutrefresh()
+
+            curses.doupdate()
+
+        except curses.error:
+            pass
+
+        metrics.RENDER_SECONDS.observe(time.perf_counter() - started)
+
+    def remove_order(self, key):
+        """Drop an order that is no longer tracked, leaving its detail view if it was open."""
+        self.table.remove(key)
+        self.dirty = True
+        if self.view == "detail" and key == self.order_key and self.table.snapshots:
+            self.view = "table"
+            self.layout()
+
+    def show_view(self, view):
+        """Switch between the dashboard table and the single-order detail box."""
+        if view == "detail":
+            key = self.dashboard.selected_key()
+            if key is None:
+                return
+            self.order_key = key
+            self.order = self.table.snapshots[key]
+        self.view = view
+        self.layout()
+
+    def draw_stats(self, usable):
+        """Metrics digest in the free rows under the progress bar."""
+        rows = max(self.box_height - 2 - self.STATS_ROW, 0)
+        for i, line in enumerate(metrics.summary_lines()[-rows:] if rows else []):
+            self.draw_field(f"stats{i}", self.STATS_ROW + i, 2, line[:usable], curses.A_DIM)
+        self.stats_updated = time.monotonic()
+
+    def build_alert(self, message):
+        try:
             #Calculate alert box dimensions
             alert_height = 5
             alert_width = len(message) + 10
             alert_y = (self.height - alert_height) // 2
             alert_x = (self.width - alert_width) // 2
+
+            alert = curses.newwin(alert_height + 2, alert_width, alert_y, alert_x)
             
             #Draw alert box
-            self.draw_box(alert_y, alert_x, alert_height, alert_width)
+            self.draw_box(alert, 0, 0, alert_height, alert_width)
             
             #Display message
-            self.stdscr.addstr(alert_y + 2, alert_x + 5, message, curses.A_BOLD | curses.color_pair(3))
-            self.stdscr.addstr(alert_y + 6, alert_x + (alert_width - 23) // 2, "Press any key to dismiss", curses.A_DIM)
-
-            self.stdscr.refresh()
-
-            self.stdscr.nodelay(False)
-            self.stdscr.getch()
+            alert.addstr(2, 5, message, curses.A_BOLD | curses.color_pair(3))
+            alert.addstr(alert_height + 1, max((alert_width - 24) // 2, 0), "Press any key to dismiss"[:alert_width - 1], curses.A_DIM)
+            return alert
 
         except curses.error:
-            pass
+            return None
+    
+    def show_alert(self, message):
+        """Overlay an alert until the next key press, without blocking anything."""
+        self.alert_message = message
+        self.alert = self.build_alert(message)
+        self.dirty = True
 
-        finally:
-            self.stdscr.nodelay(True)
+    def dismiss_alert(self):
+        self.alert = None
+        self.layout()
 
-            self.stdscr.clear()
+    def play_notification(self, notification):
+        self.show_alert(notification.message)
 
-            #Redraw main screen
+    def drain_updates(self):
+        """Take every snapshot and notification published since the last call."""
+        while self.alerts is not None:
             try:
-                self.update_display()
-                self.stdscr.refresh()
+                self.play_notification(self.alerts.get_nowait())
+            except queue.Empty:
+                break
 
-            except curses.error:
-                pass
-    
-    def check_dominos_status(self, store_id, order_key):
-        try:
-            url = f"{CONFIG['pizza_services']['dominos']['base_url']}?storeId={store_id}&orderKey={order_key}"
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-
-            print(f"Trying to connect to: {url}")
-            
-            response = requests.get(url, headers=headers)
-            
-            print(f"Response status code: {response.status_code}")
-            print(f"Response Content: {response.text[:100]}...")
-
-            if response.status_code == 200:
-                data = response.json()
-                
-                #Parse the Domino's status response
-                if 'order' in data and 'orderStatus' in data['order']:
-                    status = data['order']['orderStatus']
-                    
-                    #Status Mapping
-                    status_mapping = {
-                        "OrderPlaced": "Order received",
-                        "OrderMaking": "Making your pizza",
-                        "OrderBaking": "Baking your pizza",
-                        "OrderSent": "Pizza is on its way!",
-                        "OrderDelivered": "Pizza delivered!"
-                    }
-                    
-                    #Progress percentage
-                    progress_mapping = {
-                        "OrderPlaced": 20,
-                        "OrderMaking": 40,
-                        "OrderBaking": 60,
-                        "OrderSent": 80,
-                        "OrderDelivered": 100
-                    }
-                    
-                    self.current_status = status_mapping.get(status, f"Status: {status}")
-                    self.progress = progress_mapping.get(status, 0)
-                    
-                    #Check for ETA
-                    if 'estimatedDeliveryTime' in data['order']:
-                        self.delivery_eta = data['order']['estimatedDeliveryTime']
-                    
-                    #Check for order
-                    if 'orderDescription' in data['order']:
-                        self.current_order = data['order']['orderDescription']
-                    
-                    #Check if delivered
-                    if status == "OrderDelivered" and not self.is_delivered:
-                        self.is_delivered = True
-                        self.play_notification()
-                    
-                    #Update last check time
-                    self.last_update_time = datetime.now()
-                    return True
-                
-            logger.warning(f"Failed to get status. Status code: {response.status_code}")
-            return False
-            
-        except Exception as e:
-            import traceback
-            print(f"Error checking Dominos status: {e}")
-            print(traceback.format_exc())
-            logger.error(f"Error checking Domino's status: {e}")
-            self.current_status = "Error checking status"
-            return False
-    
-    def check_pizza_hut_status(self, order_id):
-        self.current_status = "Pizza Hut tracking not implemented"
-        return False
-    
-    def check_papa_johns_status(self, order_number):
-        self.current_status = "Papa John's tracking not implemented"
-        return False
-    
-    def check_status(self):
-        status_checked = False
-        
-        if CONFIG["pizza_services"]["dominos"]["enabled"]:
-            params = CONFIG["pizza_services"]["dominos"]["tracking_params"]
-            if params["store_id"] and params["order_key"]:
-                status_checked = self.check_dominos_status(
-                    params["store_id"], 
-                    params["order_key"]
-                )
-        
-        if not status_checked and CONFIG["pizza_services"]["pizza_hut"]["enabled"]:
-            params = CONFIG["pizza_services"]["pizza_hut"]["tracking_params"]
-            if params["order_id"]:
-                status_checked = self.check_pizza_hut_status(params["order_id"])
-        
-        if not status_checked and CONFIG["pizza_services"]["papa_johns"]["enabled"]:
-            params = CONFIG["pizza_services"]["papa_johns"]["tracking_params"]
-            if params["order_number"]:
-                status_checked = self.check_papa_johns_status(params["order_number"])
-    
-    def play_notification(self):
-        self.notification_played = True
-        self.show_alert("IT'S PIZZA TIME!")
+        while True:
+            try:
+                snapshot = self.updates.get_nowait()
+            except queue.Empty:
+                return
+
+            if isinstance(snapshot, OrderRemoved):
+                self.remove_order(snapshot.key)
+                continue
+
+            self.table.update(snapshot)
+            if self.view == "table":
+                self.dirty = True
+            elif snapshot.key == self.order_key and snapshot != self.order:
+                self.order = snapshot
+                self.dirty = True
     
-    def tracking_loop(self):
-        logger.info("Starting pizza tracking")
-        last_check_time = 0
-
+    def run(self):
+        """UI loop, consumes snapshots and keys until q is pressed."""
         try:
             while self.running:
-                current_time = time.time()
+                self.drain_updates()
 
-                if current_time - last_check_time >= CONFIG["check_interval"]:
-                   self.check_status()
-                   last_check_time = current_time
+                #The stats panel changes without the order changing
+                if self.show_stats and time.monotonic() - self.stats_updated >= 1:
+                    self.dirty = True
 
-                   with open('debug.log', 'a') as f:
-                       f.write(f"Checked at {datetime.now().strftime('%H:%M:%S')}: {self.current_status}\n")
-
-                self.update_display()
+                #Only repaint when the order changed or the terminal was resized
+                if self.dirty:
+                    self.dirty = False
+                    self.update_display()
                 
                 try:
                     key = self.stdscr.getch()
-                    if key == ord('q'):
+                    if key == curses.KEY_RESIZE:
+                        curses.update_lines_cols()
+                        self.layout()
+                    elif key != -1 and self.alert is not None:
+                        self.dismiss_alert()
+                    elif key == ord('q'):
                         self.running = False
-                except:
+                    elif key == ord('s'):
+                        self.show_stats = not self.show_stats
+                        self.layout()
+                    elif self.view == "table":
+                        if key in (curses.KEY_ENTER, 10, 13):
+                            self.show_view("detail")
+                        elif self.dashboard.handle_key(key):
+                            self.dirty = True
+                    elif key in (27, curses.KEY_BACKSPACE, 127) and len(self.table.snapshots) > 1:
+                        self.show_view("table")
+                except curses.error:
                     pass
                 
-                time.sleep(0.1)
-                
         except Exception as e:
-            import traceback
-            with open('debug.log', 'a') as f:
-                f.write(f"Error in tracking loop: {e}\n")
-                f.write(traceback.format_exc())
-            logger.error(f"Error in tracking loop: {e}")
+            logger.exception(f"Error in tracking loop: {e}")
+
+        finally:
+            self.engine.unsubscribe(self.updates)
 
-def load_config():
+def default_config_file():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pizza_config.json')
+
+
+def load_config(config_file=None):
+    """Deep-merge and validate pizza_config.json into CONFIG, returns True if a file was loaded."""
     global CONFIG
-    config_file = os.path.join(os.path.dirname(__file__), 'pizza_config.json')
+    config_file = config_file or default_config_file()
     
     if os.path.exists(config_file):
         try:
-            with open(config_file, 'r') as f:
-                loaded_config = json.load(f)
-                CONFIG.update(loaded_config)
-            logger.info("Configuration loaded from pizza_config.json")
+            CONFIG = load_file(config_file, CONFIG)
+            logger.info(f"Configuration loaded from {config_file}")
 
             sound_file = CONFIG["sound_file"]
             if not os.path.exists(sound_file):
@@ -348,9 +483,70 @@ def load_config():
                     logger.info(f"Sound file found at {alt_sound_path}")
                 else:
                     logger.warning(f"Sound file not found: {sound_file}")
+            return True
         except Exception as e:
             logger.error(f"Error loading configuration: {e}")
 
+    return False
+
+
+def parse_order(text):
+    """Turn 'dominos:1234/ABCD1234' or 'pizza_hut:order_id=PH1' into an order dict."""
+    service, _, rest = text.partition(":")
+    if not service or not rest:
+        raise argparse.ArgumentTypeError(f"expected SERVICE:PARAMS, got {text!r}")
+
+    if "=" in rest:
+        params = dict(part.split("=", 1) for part in rest.split(","))
+    else:
+        names = key_params_for(service)
+        values = rest.split("/")
+        if not names or len(values) != len(names):
+            raise argparse.ArgumentTypeError(f"{service} orders look like {service}:{'/'.join(names) or '...'}")
+        params = dict(zip(names, values))
+
+    params["service"] = service
+    return params
+
+
+def parse_speed(text):
+    """--speed type, replay.py is only imported once the option is actually given."""
+    from replay import parse_speed
+    return parse_speed(text)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Terminal pizza delivery tracker")
+    parser.add_argument("--config", help="path to pizza_config.json")
+    parser.add_argument("--order", action="append", type=parse_order, default=[],
+                        metavar="SERVICE:PARAMS", help="track this order, e.g. dominos:1234/ABCD1234 (repeatable)")
+    parser.add_argument("--interval", type=float, help="override check_interval in seconds")
+    parser.add_argument("--setup", action="store_true", help="run the interactive setup even if a config exists")
+    parser.add_argument("--profile-startup", action="store_true", help="report import and startup timings on exit")
+    parser.add_argument("--daemon", action="store_true", help="run headless and serve status over a local HTTP API")
+    parser.add_argument("--listen", metavar="HOST:PORT",
+                        help="address for the HTTP API and /metrics, always on in daemon mode (default 127.0.0.1:8765)")
+    parser.add_argument("--stats", action="store_true", help="show the metrics panel in the terminal UI")
+    parser.add_argument("--record", metavar="PATH", help="append every raw service response to a session file")
+    parser.add_argument("--replay", metavar="PATH", help="track the orders of a recorded session instead of the live services")
+    parser.add_argument("--speed", type=parse_speed, default=1.0,
+                        help="replay speed as a multiple of real time, or max for as fast as possible (default 1)")
+    parser.add_argument("--workers", type=int, metavar="N", help="poll from N worker processes (default 0, in-process)")
+    return parser.parse_args(argv)
+
+
+def has_orders():
+    """True when the config names at least one order for an enabled service."""
+    services = CONFIG["pizza_services"]
+    for order in CONFIG.get("orders", []):
+        if services.get(order.get("service"), {}).get("enabled"):
+            return True
+    for service_config in services.values():
+        params = service_config.get("tracking_params", {})
+        if service_config.get("enabled") and params and all(params.values()):
+            return True
+    return False
+
 
 def setup_config():
     print("\n==== Pizza Tracker Setup ====")
@@ -359,8 +555,10 @@ def setup_config():
     print("2. Pizza Hut")
     print("3. Papa John's")
     print("4. Domino's Pizza (Local Test Server)")
+    print("5. Pizza Hut (Local Test Server)")
+    print("6. Papa John's (Local Test Server)")
     
-    choice = input("Enter your choice (1-4): ")
+    choice = input("Enter your choice (1-6): ")
     
     for service in CONFIG["pizza_services"]:
         CONFIG["pizza_services"][service]["enabled"] = False
@@ -388,6 +586,18 @@ def setup_config():
         CONFIG["pizza_services"]["dominos"]["tracking_params"]["store_id"] = "1234"
         CONFIG["pizza_services"]["dominos"]["tracking_params"]["order_key"] = "ABCD1234"
         print("Configured for local test server with default test credentials")
+
+    elif choice == "5":
+        CONFIG["pizza_services"]["pizza_hut"]["enabled"] = True
+        CONFIG["pizza_services"]["pizza_hut"]["base_url"] = "http://localhost:5000/api/oh-yeah/track"
+        CONFIG["pizza_services"]["pizza_hut"]["tracking_params"]["order_id"] = "PH123456"
+        print("Configured for local test server with default test credentials")
+
+    elif choice == "6":
+        CONFIG["pizza_services"]["papa_johns"]["enabled"] = True
+        CONFIG["pizza_services"]["papa_johns"]["base_url"] = "http://localhost:5000/order/trackorder"
+        CONFIG["pizza_services"]["papa_johns"]["tracking_params"]["order_number"] = "PJ123456"
+        print("Configured for local test server with default test credentials")
     
     else:
         print("Invalid choice. Using default configuration.")
@@ -399,25 +609,154 @@ def setup_config():
     print("Configuration saved to pizza_config.json")
 
 
-def main():
-    load_config()
-    setup_config()
-    
+def apply_args(config, args):
+    """Layer the command line overrides on top of a loaded config."""
+    for order in args.order:
+        config["pizza_services"].setdefault(order["service"], {})["enabled"] = True
+        config["orders"] = config.get("orders", []) + [order]
+    if args.interval:
+        config["check_interval"] = args.interval
+    if args.listen:
+        host, _, port = args.listen.rpartition(":")
+        config["api"] = dict(config.get("api", {}), host=host or "127.0.0.1", port=int(port))
+    if args.workers is not None:
+        config["sharding"] = dict(config.get("sharding", {}), workers=args.workers)
+    return config
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    PROFILE.enabled = args.profile_startup
+
+    defaults = copy.deepcopy(CONFIG)
+    loaded = load_config(args.config)
+    apply_args(CONFIG, args)
+    PROFILE.mark("config loaded")
+
+    #A replay tracks the recorded orders on its own clock, and leaves history and cache alone
+    replay = None
+    if args.replay:
+        from replay import Recording, ReplaySession
+        replay = ReplaySession(Recording.load(args.replay), args.speed)
+        replay.configure(CONFIG)
+
+    #Only ask questions when there is nothing to track yet, a daemon never asks
+    elif args.setup or (not args.daemon and not (loaded and has_orders())):
+        setup_config()
+
+    event_log = EventLog.from_config(CONFIG).start()
+    history = OrderHistory.from_config(CONFIG).start() if CONFIG["history"]["enabled"] and replay is None else None
+    cache = ResponseCache.from_config(CONFIG).start() if CONFIG["cache"]["enabled"] and replay is None else None
+    recorder = None
+    if args.record:
+        from replay import SessionRecorder
+        recorder = SessionRecorder(args.record).start()
+
+    #Pick up orders and settings edited into the config file while tracking
+    watcher = None
+    if replay is None:
+        config_file = args.config or default_config_file()
+        watcher = ConfigWatcher(config_file, lambda: apply_args(load_file(config_file, defaults), args)).start()
+
+    #Decodes the sound in the background so it never delays the first status
+    notifications = NotificationCenter.from_config(CONFIG).start()
+
+    #Log lines written to the console would corrupt the curses screen
+    restore_logging = capture_logging(event_log, console=args.daemon)
     
-    #Start the terminal UI
+    #Start the terminal UI, or the HTTP API in daemon mode
     try:
-        curses.wrapper(lambda stdscr: run_tracker(stdscr))
+        if args.daemon:
+            run_daemon(event_log, history, notifications, cache, watcher, recorder, replay)
+        else:
+            curses.wrapper(lambda stdscr: run_tracker(
+                stdscr, event_log, history, notifications, cache, watcher, recorder, replay,
+                show_stats=args.stats, serve_api=bool(args.listen)
+            ))
     except KeyboardInterrupt:
         logger.info("Pizza tracking stopped by user")
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        notifications.stop()
+        restore_logging()
+        if history is not None:
+            history.close()
+        if cache is not None:
+            cache.close()
+        if recorder is not None:
+            recorder.close()
+        event_log.close()
+        PROFILE.report()
+
+
+def build_engine(event_log=None, history=None, notifications=None, cache=None, watcher=None, recorder=None, replay=None):
+    #Worker processes poll on the real clock with their own connections, so replays stay in-process
+    if CONFIG["sharding"]["workers"] > 0 and replay is None:
+        if cache is not None or recorder is not None:
+            logger.warning("The response cache and session recording are not used with worker processes")
+        #multiprocessing is only loaded when workers are asked for
+        from sharding import ShardedEngine
+        engine = ShardedEngine.from_config(CONFIG, event_log)
+    else:
+        engine = TrackingEngine(
+            CONFIG, max_in_flight=CONFIG["max_in_flight"], event_log=event_log, cache=cache, recorder=recorder,
+            clock=replay.clock if replay is not None else None,
+            transport_factory=replay.transport if replay is not None else None
+        )
+    if watcher is not None:
+        watcher.add_listener(engine.apply_config)
+    if history is not None:
+        engine.add_listener(history.record)
+        engine.add_removed_listener(history.forget)
+    if notifications is not None:
+        engine.add_listener(notifications.check)
+        engine.add_removed_listener(notifications.forget)
+    engine.add_listener(lambda state: state.last_update_time and PROFILE.mark("first status"))
+    return engine
+
+
+def run_daemon(event_log=None, history=None, notifications=None, cache=None, watcher=None, recorder=None, replay=None):
+    """Track headless until SIGINT/SIGTERM, serving snapshots over HTTP and SSE."""
+    from status_api import build_status_api
+
+    engine = build_engine(event_log, history, notifications, cache, watcher, recorder, replay)
+    _, server = build_status_api(CONFIG, engine)
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+
+    server.start()
+    PROFILE.mark("api ready")
+    engine.start()
 
+    try:
+        while not stopped.wait(1):
+            pass
+    finally:
+        engine.stop()
+        server.stop()
 
-def run_tracker(stdscr):
 
-    tracker = PizzaTrackerTerminal(stdscr)
-    
-    while tracker.running:
-        time.sleep(0.1)
+def run_tracker(stdscr, event_log=None, history=None, notifications=None, cache=None, watcher=None,
+                recorder=None, replay=None, show_stats=False, serve_api=False):
+
+    engine = build_engine(event_log, history, notifications, cache, watcher, recorder, replay)
+    tracker = PizzaTrackerTerminal(stdscr, engine, notifications, show_stats)
+
+    #With --listen the UI also serves the status API and /metrics, http.server is only loaded then
+    server = None
+    if serve_api:
+        from status_api import build_status_api
+        server = build_status_api(CONFIG, engine)[1].start()
+
+    PROFILE.mark("ui ready")
+    engine.start()
+    tracker.run()
     
+    engine.stop()
+    if server is not None:
+        server.stop()
     curses.endwin()
 
 
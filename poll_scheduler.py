@@ -0,0 +1,143 @@
+import heapq
+import itertools
+import random
+from datetime import datetime, timedelta
+
+#Stages where nothing visible happens for a while, so polling can back off
+PREPARING_STATUSES = ("OrderPlaced", "OrderMaking", "OrderBaking")
+
+DEFAULT_SCHEDULE_CONFIG = {
+    "slow_interval": 30,
+    "fast_interval": 3,
+    "max_backoff": 300,
+    "jitter": 0.1
+}
+
+ETA_FORMATS = ("%I:%M %p", "%H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S")
+
+
+def parse_eta(text, now=None):
+    """Turn a provider ETA string such as ' 07:45 PM' into a datetime, or None."""
+    if not text:
+        return None
+
+    now = now or datetime.now()
+    text = text.strip()
+
+    for fmt in ETA_FORMATS:
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+
+        if parsed.year != 1900:
+            return parsed
+
+        #Time of day only, pick the closest matching day
+        eta = now.replace(hour=parsed.hour, minute=parsed.minute, second=0, microsecond=0)
+        if eta < now - timedelta(hours=12):
+            eta += timedelta(days=1)
+        return eta
+
+    return None
+
+
+class PollScheduler:
+    """Min-heap of next-due times keyed by order.
+
+    Rescheduling or cancelling an order leaves its old heap entry behind;
+    stale entries are recognised by comparing against _due and skipped when
+    they reach the top, which keeps every operation O(log n).
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._due = {}
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._due)
+
+    def __contains__(self, key):
+        return key in self._due
+
+    def schedule(self, key, due):
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, next(self._counter), key))
+
+    def cancel(self, key):
+        self._due.pop(key, None)
+
+    def _drop_stale(self):
+        heap = self._heap
+        while heap and self._due.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    def next_due(self):
+        """Time the earliest order is due, or None when nothing is scheduled."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """Remove and return the keys of every order due at or before now."""
+        due = []
+        heap = self._heap
+
+        while True:
+            self._drop_stale()
+            if not heap or heap[0][0] > now:
+                return due
+            _, _, key = heapq.heappop(heap)
+            del self._due[key]
+            due.append(key)
+
+
+class PollPolicy:
+    """Decides how long to wait before an order is checked again."""
+
+    def __init__(self, check_interval=10, slow_interval=30, fast_interval=3, max_backoff=300, jitter=0.1):
+        self.check_interval = check_interval
+        self.slow_interval = slow_interval
+        self.fast_interval = fast_interval
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+
+    @classmethod
+    def from_config(cls, config):
+        settings = dict(DEFAULT_SCHEDULE_CONFIG)
+        settings.update(config.get("schedule", {}))
+        return cls(check_interval=config["check_interval"], **settings)
+
+    def next_delay(self, state, ok, now=None, not_before=0):
+        """Seconds until state should be polled again, None to stop polling it.
+
+        not_before holds failed orders back, e.g. until their service's
+        circuit breaker lets requests through again.
+        """
+        if not ok:
+            #Exponential backoff on consecutive errors
+            delay = min(self.check_interval * (2 ** max(state.failures - 1, 0)), self.max_backoff)
+            return self._with_jitter(max(delay, not_before))
+
+        if state.raw_status == "OrderDelivered" or state.is_delivered:
+            return None
+
+        if state.raw_status in PREPARING_STATUSES:
+            delay = self.slow_interval
+        elif state.raw_status == "OrderSent" and state.distance_falling:
+            delay = self.fast_interval
+        else:
+            delay = self.check_interval
+
+        #Never sleep through a large part of the time left until the ETA
+        eta = parse_eta(state.delivery_eta, now)
+        if eta is not None:
+            remaining = (eta - (now or datetime.now())).total_seconds()
+            delay = min(delay, max(self.fast_interval, remaining / 4))
+
+        return self._with_jitter(delay)
+
+    def _with_jitter(self, delay):
+        if self.jitter:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return delay
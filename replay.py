@@ -0,0 +1,351 @@
+import argparse
+import bisect
+import copy
+import gzip
+import json
+import logging
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+
+from clock import VirtualClock
+from pizza_services import get_adapter_class
+from tracking_engine import make_order_key
+
+logger = logging.getLogger(__name__)
+
+VERSION = 1
+
+
+def dumps(record):
+    return json.dumps(record, separators=(",", ":"))
+
+
+class SessionRecorder:
+    """Appends every raw service response to a compact session file.
+
+    Each session starts with a {"version", "started"} header and declares
+    every order once as ["o", id, service, params]. A check is then one
+    line: [ms since started, id, body] for a new body, [ms, id] when the
+    body did not change and [ms, id, null, error] when it failed.
+    record() only queues the line. A background thread appends everything
+    queued as one gzip member every flush_interval seconds, so the file is
+    never rewritten and a crash loses at most the last batch.
+    """
+
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.started = time.time()
+
+        self._ids = {}
+        self._bodies = {}
+        self._lines = deque([dumps({"version": VERSION, "started": round(self.started, 3)})])
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._file = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._running = False
+
+    def record(self, service, params, data=None, error=None):
+        """Queue one check, data is None for a 304 and error the exception of a failed one."""
+        key = make_order_key(service, params)
+        offset = round((time.time() - self.started) * 1000)
+
+        with self._lock:
+            order = self._ids.get(key)
+            if order is None:
+                order = self._ids[key] = len(self._ids)
+                self._lines.append(dumps(["o", order, service, params]))
+
+            if error is not None:
+                record = [offset, order, None, str(error)]
+            elif data is None or data == self._bodies.get(key):
+                record = [offset, order]
+            else:
+                self._bodies[key] = data
+                record = [offset, order, data]
+            self._lines.append(dumps(record))
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._flush_loop, name="pizza-recorder")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def _flush_loop(self):
+        while self._running:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning(f"Could not write session recording: {e}")
+
+    def flush(self):
+        """Append everything queued so far as one gzip member."""
+        with self._write_lock:
+            with self._lock:
+                lines, self._lines = self._lines, deque()
+            if not lines:
+                return
+
+            if self._file is None:
+                self._file = open(self.path, "ab")
+            self._file.write(gzip.compress(("\n".join(lines) + "\n").encode("utf-8")))
+            self._file.flush()
+
+    def close(self):
+        self._running = False
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class Recording:
+    """Recorded responses of every order, indexed by time.
+
+    Only responses that changed something are kept, a check that got the
+    same body as before adds nothing to replay.
+    """
+
+    def __init__(self):
+        self.orders = {}
+        self.timelines = {}
+        self.start = None
+        self.end = None
+        self.checks = 0
+
+    @classmethod
+    def load(cls, path):
+        recording = cls()
+        started, ids, bodies = None, {}, {}
+
+        for record in read_records(path):
+            if isinstance(record, dict):
+                #A new session, ids start over
+                started, ids = record["started"], {}
+                continue
+            if record[0] == "o":
+                _, order, service, params = record
+                ids[order] = recording.declare(service, params)
+                continue
+
+            key = ids[record[1]]
+            when = started + record[0] / 1000
+            if len(record) > 2 and record[2] is None:
+                recording.add(key, when, error=record[3])
+            elif len(record) > 2:
+                bodies[key] = record[2]
+                recording.add(key, when, record[2])
+            else:
+                #Same body again, only worth keeping if the last entry was an error
+                recording.add(key, when, bodies.get(key), repeat=True)
+
+        if recording.start is None:
+            raise ValueError(f"No responses recorded in {path}")
+        return recording
+
+    def declare(self, service, params):
+        """Add an order, returns its key."""
+        key = make_order_key(service, params)
+        if key not in self.orders:
+            self.orders[key] = (service, params)
+            self.timelines[key] = ([], [])
+        return key
+
+    def add(self, key, when, data=None, error=None, repeat=False):
+        """Add one check of key at the epoch time when."""
+        self.checks += 1
+        self.start = when if self.start is None else min(self.start, when)
+        self.end = when if self.end is None else max(self.end, when)
+
+        times, responses = self.timelines[key]
+        if repeat and (data is None or (responses and responses[-1][1] is None)):
+            return
+        times.append(when)
+        responses.append((data, error))
+
+    def response(self, key, when):
+        """(index, body, error) of the last response of key at or before when.
+
+        Before its first recorded check an order gets that first response.
+        """
+        times, responses = self.timelines[key]
+        if not times:
+            return -1, None, "No response recorded"
+        index = max(bisect.bisect_right(times, when) - 1, 0)
+        data, error = responses[index]
+        return index, data, error
+
+
+def read_records(path):
+    """Every record in a session file, stopping quietly at a batch cut short by a crash."""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+    except (EOFError, zlib.error, gzip.BadGzipFile, json.JSONDecodeError) as e:
+        logger.warning(f"{path} ends in an incomplete batch, replaying what came before it ({e})")
+
+
+class ReplayTransport:
+    """Stands in for a ServiceTransport, answering from a Recording.
+
+    Every request gets the response its order had at the replay clock's
+    current time. Asking again before that response changed is answered
+    like a 304, so the not-modified path is exercised too.
+    """
+
+    def __init__(self, service, recording, clock, requests):
+        self.service = service
+        self.recording = recording
+        self.clock = clock
+        self.requests = requests
+
+        self._served = {}
+        self._lock = threading.Lock()
+
+    def get_json(self, url, params=None):
+        key = self.requests.get((url, tuple(sorted((params or {}).items()))))
+        if key is None:
+            raise RuntimeError(f"No recorded responses for {url} {params}")
+
+        index, data, error = self.recording.response(key, self.clock.time())
+        if error is not None:
+            raise RuntimeError(error)
+
+        with self._lock:
+            changed = self._served.get(key) != index
+            self._served[key] = index
+        return data, changed
+
+    def forget(self, url, params=None):
+        pass
+
+    def close(self):
+        pass
+
+
+class ReplaySession:
+    """Runs the tracker against a Recording on a virtual clock.
+
+    speed is how many times faster than real time the recording plays,
+    None for as fast as the tracker can go. The clock keeps running for
+    `tail` seconds after the last recorded check, so every order still
+    being polled gets to see its last response.
+    """
+
+    def __init__(self, recording, speed=None, tail=60):
+        self.recording = recording
+        self.clock = VirtualClock(recording.start, speed, recording.end + tail)
+
+    def configure(self, config):
+        """Make config track exactly the recorded orders, returns it."""
+        services = config["pizza_services"]
+        recorded = {service for service, _ in self.recording.orders.values()}
+
+        for name in set(services) | recorded:
+            service = services.setdefault(name, {})
+            service["enabled"] = name in recorded
+            service["tracking_params"] = {}
+            service.setdefault("base_url", f"replay://{name}")
+            #Waiting for a rate limit would run on real time
+            service.pop("rate_limit", None)
+
+        config["orders"] = [dict(params, service=service) for service, params in self.recording.orders.values()]
+        #Without jitter every replay polls at the same virtual times
+        config["schedule"] = dict(config.get("schedule", {}), jitter=0)
+        return config
+
+    def transport(self, service, service_config, http_config=None):
+        """TrackingEngine transport_factory serving the recorded responses of service."""
+        adapter = get_adapter_class(service)(service_config, None)
+        requests = {}
+        for key, (order_service, params) in self.recording.orders.items():
+            if order_service == service:
+                url, query = adapter.build_request(params)
+                requests[(url, tuple(sorted(query.items())))] = key
+        return ReplayTransport(service, self.recording, self.clock, requests)
+
+
+def parse_speed(text):
+    """'max' for as fast as possible (None), otherwise a positive multiple of real time."""
+    if text == "max":
+        return None
+    try:
+        speed = float(text)
+    except ValueError:
+        speed = 0
+    if speed <= 0:
+        raise argparse.ArgumentTypeError(f"expected a positive number or 'max', got {text!r}")
+    return speed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded tracking session headless")
+    parser.add_argument("recording", help="session file written with pizza_tracker.py --record")
+    parser.add_argument("--speed", type=parse_speed, default=None, help="multiple of real time, or max (default)")
+    parser.add_argument("--config", help="pizza_config.json whose schedule and notification settings to use")
+    args = parser.parse_args(argv)
+
+    #The tracker's defaults, only imported here since it pulls in curses
+    import pizza_tracker
+    from config_loader import load_file
+    from notifications import NotificationCenter
+    from tracking_engine import TrackingEngine
+
+    config = copy.deepcopy(pizza_tracker.CONFIG)
+    if args.config:
+        config = load_file(args.config, config)
+
+    session = ReplaySession(Recording.load(args.recording), args.speed)
+    session.configure(config)
+    engine = TrackingEngine(config, max_in_flight=config["max_in_flight"], clock=session.clock,
+                            transport_factory=session.transport)
+
+    #Print every status change and alert, the same recording always gives the same lines
+    notifications = NotificationCenter.from_config(config)
+    statuses = {}
+    checks = [0]
+
+    def on_check(state):
+        checks[0] += 1
+        offset = session.clock.time() - session.recording.start
+        if state.current_status != statuses.get(state.key):
+            statuses[state.key] = state.current_status
+            print(f"{offset:9.1f}s  {state.key}  {state.raw_status}  {state.current_status}")
+        if state.key not in notifications.notified:
+            notifications.check(state)
+            if state.key in notifications.notified:
+                print(f"{offset:9.1f}s  {state.key}  notify")
+
+    engine.add_listener(on_check)
+    started = time.perf_counter()
+    engine.start()
+    try:
+        session.clock.finished.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        engine.thread.join(timeout=5)
+    wall = time.perf_counter() - started
+
+    span = session.clock.time() - session.recording.start
+    print(f"Replayed {span:.0f}s of {len(session.recording.orders)} order(s) in {wall:.2f}s: "
+          f"{checks[0]} checks, {checks[0] / wall:.0f} checks/s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
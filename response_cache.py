@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_CONFIG = {
+    "enabled": True,
+    "max_entries": 10000,
+    "path": "pizza_cache.json",
+    "save_interval": 5.0
+}
+
+
+class ResponseCache:
+    """Warm-start snapshot of the last parsed response of every order.
+
+    The engine stores each result it applies, and entries are saved to
+    disk from a background thread, so a restarted tracker shows every
+    order's last known state before its first poll completes. It never
+    answers a check: every scheduled check goes to the service. The
+    least recently stored entries are dropped beyond max_entries.
+    """
+
+    def __init__(self, max_entries=10000, path=None, save_interval=5.0):
+        self.max_entries = max_entries
+        self.path = path
+        self.save_interval = save_interval
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._thread = None
+        self._running = False
+
+    @classmethod
+    def from_config(cls, config):
+        settings = dict(DEFAULT_CACHE_CONFIG)
+        settings.update(config.get("cache", {}))
+        settings.pop("enabled")
+        return cls(**settings)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def peek(self, key):
+        """(result, wall clock time stored), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return (entry[1], entry[0]) if entry is not None else None
+
+    def put(self, key, result, stored_at=None):
+        if result.get("not_modified"):
+            return self.touch(key, stored_at)
+
+        with self._lock:
+            self._entries[key] = (stored_at or time.time(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def touch(self, key, stored_at=None):
+        """Move an entry's time forward after the server confirmed it is unchanged (304)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (stored_at or time.time(), entry[1])
+                self._entries.move_to_end(key)
+                self._dirty = True
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def load(self):
+        """Read the on-disk entries back in."""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable response cache {self.path}: {e}")
+            return 0
+
+        with self._lock:
+            for key, stored_at, result in data.get("entries", [])[-self.max_entries:]:
+                self._entries[key] = (stored_at, result)
+        return len(data.get("entries", []))
+
+    def save(self):
+        """Atomically write every entry to disk if anything changed."""
+        if not self.path:
+            return
+
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [[key, stored_at, result] for key, (stored_at, result) in self._entries.items()]
+            self._dirty = False
+
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"version": 1, "entries": entries}, f)
+        os.replace(temp_path, self.path)
+
+    def start(self):
+        """Load from disk and keep saving in the background."""
+        self.load()
+        if self.path:
+            self._running = True
+            self._thread = threading.Thread(target=self._save_loop, name="pizza-cache")
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def _save_loop(self):
+        while self._running:
+            time.sleep(self.save_interval)
+            try:
+                self.save()
+            except OSError as e:
+                logger.warning(f"Could not save response cache: {e}")
+
+    def close(self):
+        self._running = False
+        self.save()
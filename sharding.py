@@ -0,0 +1,422 @@
+import copy
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime
+from multiprocessing.connection import wait
+
+import metrics
+from config_loader import Settings
+from tracking_engine import OrderRemoved, OrderState, TrackingEngine, orders_from_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARDING_CONFIG = {
+    "workers": 0,
+    "flush_interval": 0.05,
+    "restart_delay": 1.0
+}
+
+#OrderState fields a worker streams back, only the ones that changed are sent
+DELTA_FIELDS = (
+    "raw_status", "current_status", "delivery_eta", "delivery_distance", "current_order", "progress",
+    "is_delivered", "last_update_time", "last_error", "failures", "last_latency", "distance_falling",
+    "predicted_eta", "predicted_progress"
+)
+
+
+def delta_values(state):
+    values = [getattr(state, name) for name in DELTA_FIELDS]
+    #Epoch seconds pickle smaller than a datetime
+    when = values[7]
+    values[7] = when.timestamp() if when is not None else None
+    return values
+
+
+def set_values(state, changed):
+    """Apply {field: value} as made by delta_values to state."""
+    for name, value in changed.items():
+        if name == "last_update_time":
+            value = datetime.fromtimestamp(value) if value is not None else None
+        setattr(state, name, value)
+
+
+class ForwardingHandler(logging.Handler):
+    """Queues a worker's log records so they are sent to the coordinator with the next batch."""
+
+    def __init__(self, records):
+        super().__init__(logging.INFO)
+        self.records = records
+
+    def emit(self, record):
+        self.records.append((record.levelno, record.name, record.getMessage()))
+
+
+def run_worker(conn, config, max_in_flight, flush_interval):
+    """Worker process: polls the orders it is sent and streams their changes back over conn.
+
+    Commands are ("add", [(service, params, values)]), ("remove", [key]),
+    ("config", config) and ("stop",). Every flush_interval the worker sends
+    one batch: ([(key, checks, {field: value})], [(level, logger, message)]).
+    An order arrives with what the coordinator already knows about it
+    (delta_values), so only what this worker learns is sent back.
+    """
+    #Ctrl+C reaches the whole process group, the coordinator decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    #Only the coordinator writes logs, spawning re-imported the main module and its console handler
+    records = deque()
+    root = logging.getLogger()
+    root.handlers[:] = [ForwardingHandler(records)]
+    root.setLevel(logging.INFO)
+
+    engine = TrackingEngine(config, [], max_in_flight=max_in_flight)
+    lock = threading.Lock()
+    sent = {}
+    deltas = {}
+
+    def on_check(state):
+        values = delta_values(state)
+        last = sent.get(state.key)
+        if last is None:
+            changed = dict(zip(DELTA_FIELDS, values))
+        else:
+            changed = {name: value for name, value, old in zip(DELTA_FIELDS, values, last) if value != old}
+        sent[state.key] = values
+
+        with lock:
+            entry = deltas.get(state.key)
+            if entry is None:
+                deltas[state.key] = [1, changed]
+            else:
+                entry[0] += 1
+                entry[1].update(changed)
+
+    engine.add_listener(on_check)
+    engine.start()
+
+    try:
+        while True:
+            if conn.poll(flush_interval):
+                message = conn.recv()
+                command = message[0]
+                if command == "add":
+                    for service, params, values in message[1]:
+                        state = OrderState(service, params)
+                        set_values(state, dict(zip(DELTA_FIELDS, values)))
+                        sent[state.key] = values
+                        engine.add_order(state)
+                elif command == "remove":
+                    for key in message[1]:
+                        engine.remove_order(key)
+                        sent.pop(key, None)
+                elif command == "config":
+                    engine.apply_config(message[1])
+                elif command == "stop":
+                    break
+
+            with lock:
+                batch, deltas = deltas, {}
+            logs = [records.popleft() for _ in range(len(records))]
+            if batch or logs:
+                conn.send(([(key, checks, changed) for key, (checks, changed) in batch.items()], logs))
+    except (EOFError, OSError):
+        #The coordinator is gone
+        pass
+    finally:
+        engine.stop()
+        engine.thread.join(timeout=5)
+
+
+class Worker:
+    """Coordinator side of one worker process."""
+
+    def __init__(self, index, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.keys = set()
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        with self.lock:
+            self.conn.send(message)
+
+
+class ShardedEngine(TrackingEngine):
+    """Polls orders from a pool of worker processes, one TrackingEngine each.
+
+    Every order belongs to the live worker with the highest hash of
+    (worker, order key), so adding or losing a worker only moves the
+    orders that hash to it. Workers parse and schedule on their own cores
+    with their own connection pools and send back only the fields that
+    changed, batched every flush_interval seconds. The coordinator
+    applies them to its own OrderStates and runs the listeners and
+    subscribers exactly like a single-process engine. A worker that dies
+    has its orders moved to the others straight away and is replaced
+    after restart_delay seconds.
+    """
+
+    def __init__(self, config, orders=None, workers=2, flush_interval=0.05, restart_delay=1.0,
+                 max_in_flight=32, event_log=None):
+        super().__init__(config, orders, max_in_flight, event_log)
+        self.worker_count = workers
+        self.flush_interval = flush_interval
+        self.restart_delay = restart_delay
+
+        self.workers = {}
+        self.owners = {}
+        self._context = multiprocessing.get_context("spawn")
+        self._next_index = 0
+        self._restarts = []
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_config(cls, config, event_log=None):
+        settings = dict(DEFAULT_SHARDING_CONFIG)
+        settings.update(config.get("sharding", {}))
+        return cls(config, max_in_flight=config["max_in_flight"], event_log=event_log, **settings)
+
+    def owner(self, key):
+        """The live worker an order belongs to."""
+        return max(self.workers.values(), key=lambda worker: zlib.crc32(f"{worker.index}:{key}".encode()))
+
+    def spawn_worker(self):
+        parent, child = self._context.Pipe()
+        process = self._context.Process(
+            target=run_worker, args=(child, self.worker_config(self.config), self.max_in_flight, self.flush_interval),
+            name=f"pizza-worker-{self._next_index}"
+        )
+        process.daemon = True
+        process.start()
+        child.close()
+
+        worker = Worker(self._next_index, process, parent)
+        self._next_index += 1
+        self.workers[worker.index] = worker
+        return worker
+
+    def worker_config(self, config):
+        """config with each service's rate_limit and max_in_flight split between the workers."""
+        config = copy.deepcopy(config)
+        for service in config.get("pizza_services", {}).values():
+            if service.get("rate_limit"):
+                service["rate_limit"] = service["rate_limit"] / self.worker_count
+            if service.get("max_in_flight"):
+                service["max_in_flight"] = max(1, service["max_in_flight"] // self.worker_count)
+        return config
+
+    def rebalance(self):
+        """Move every order whose owner changed, returns how many moved."""
+        with self._lock:
+            if not self.workers:
+                return 0
+
+            adds, removes = {}, {}
+            for key, state in self.orders.items():
+                #Nothing left to poll
+                if state.is_delivered:
+                    continue
+                worker = self.owner(key)
+                current = self.owners.get(key)
+                if current is worker:
+                    continue
+                if current is not None and current.index in self.workers:
+                    removes.setdefault(current, []).append(key)
+                    current.keys.discard(key)
+                adds.setdefault(worker, []).append((state.service, state.params, delta_values(state)))
+                worker.keys.add(key)
+                self.owners[key] = worker
+
+            for worker, keys in removes.items():
+                self._send(worker, ("remove", keys))
+            for worker, orders in adds.items():
+                self._send(worker, ("add", orders))
+            return sum(len(orders) for orders in adds.values())
+
+    def _send(self, worker, message):
+        try:
+            worker.send(message)
+        except (OSError, ValueError):
+            #Noticed and handled by the coordinator thread
+            pass
+
+    def add_order(self, state):
+        state.attach(self.store)
+        with self._lock:
+            self.orders[state.key] = state
+            if self.running:
+                self.rebalance()
+        return state
+
+    def remove_order(self, key):
+        with self._lock:
+            state = self.orders.pop(key, None)
+            if state is not None:
+                state.detach()
+            worker = self.owners.pop(key, None)
+            if worker is not None:
+                worker.keys.discard(key)
+                self._send(worker, ("remove", [key]))
+
+        if state is not None:
+            for callback in self.removed_listeners:
+                callback(key)
+            for channel in self.subscribers:
+                channel.put(OrderRemoved(key))
+        return state
+
+    def _apply_config(self, config):
+        try:
+            settings = Settings(config)
+        except ValueError as e:
+            logger.error(f"Ignoring configuration that cannot be applied: {e}")
+            return
+
+        with self._lock:
+            self.config = config
+            self.settings = settings
+            shared = self.worker_config(config)
+            for worker in list(self.workers.values()):
+                self._send(worker, ("config", shared))
+
+            if self.config_orders:
+                wanted = {state.key: state for state in orders_from_config(config)}
+                for key in [key for key in self.orders if key not in wanted]:
+                    self.remove_order(key)
+                for key, state in wanted.items():
+                    if key not in self.orders:
+                        self.add_order(state)
+                    else:
+                        state.detach()
+
+        logger.info(f"Configuration applied, tracking {len(self.orders)} order(s) on {len(self.workers)} worker(s)")
+
+    def start(self):
+        self.running = True
+        with self._lock:
+            for _ in range(self.worker_count):
+                self.spawn_worker()
+            self.rebalance()
+        logger.info(f"Starting pizza tracking for {len(self.orders)} order(s) on {self.worker_count} worker process(es)")
+
+        self.thread = threading.Thread(target=self._run, name="pizza-shards")
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+
+    def _add_subscriber(self, channel):
+        with self._lock:
+            super()._add_subscriber(channel)
+
+    def _remove_subscriber(self, channel):
+        with self._lock:
+            super()._remove_subscriber(channel)
+
+    def _run(self):
+        try:
+            while self.running:
+                metrics.ORDERS.set(len(self.orders))
+                self._restart_due()
+
+                with self._lock:
+                    waiting = {worker.conn: worker for worker in self.workers.values()}
+                    waiting.update({worker.process.sentinel: worker for worker in self.workers.values()})
+
+                timeout = 0.5 if not self._restarts else max(min(self._restarts) - time.monotonic(), 0)
+                for ready in wait(list(waiting), min(timeout, 0.5)):
+                    worker = waiting[ready]
+                    if worker.index not in self.workers:
+                        continue
+                    if ready is worker.conn:
+                        self._receive(worker)
+                    elif not worker.process.is_alive():
+                        self._lost(worker)
+        finally:
+            self._shutdown()
+
+    def _receive(self, worker):
+        try:
+            while worker.conn.poll():
+                deltas, logs = worker.conn.recv()
+                for level, name, message in logs:
+                    logging.getLogger(name).log(level, f"[worker {worker.index}] {message}")
+                with self._lock:
+                    for key, checks, changed in deltas:
+                        self._apply_delta(worker, key, checks, changed)
+        except (EOFError, OSError):
+            self._lost(worker)
+
+    def _apply_delta(self, worker, key, checks, changed):
+        state = self.orders.get(key)
+        #A late batch for an order that has moved on
+        if state is None or self.owners.get(key) is not worker:
+            return
+
+        delivered = changed.get("is_delivered") and not state.is_delivered
+        set_values(state, changed)
+        state.checks += checks
+        metrics.CHECKS.labels(state.service).inc(checks)
+
+        if delivered:
+            for callback in self.delivered_listeners:
+                callback(state)
+        if self.event_log is not None:
+            self.event_log.emit(
+                "check", order=state.key, service=state.service, ok=state.last_error is None,
+                status=state.raw_status, distance=state.delivery_distance, error=state.last_error
+            )
+        for callback in self.listeners:
+            callback(state)
+        self.publish(state)
+
+    def _lost(self, worker):
+        with self._lock:
+            if self.workers.pop(worker.index, None) is None:
+                return
+            worker.conn.close()
+            for key in worker.keys:
+                if self.owners.get(key) is worker:
+                    del self.owners[key]
+            #Workers going down with the coordinator are not replaced
+            if not self.running:
+                return
+
+            moved = self.rebalance()
+            self._restarts.append(time.monotonic() + self.restart_delay)
+        logger.warning(f"Worker {worker.index} exited with code {worker.process.exitcode}, "
+                       f"moved its {moved} order(s) to {len(self.workers)} other worker(s)")
+
+    def _restart_due(self):
+        now = time.monotonic()
+        due = [when for when in self._restarts if when <= now]
+        if not due:
+            return
+        self._restarts = [when for when in self._restarts if when > now]
+
+        with self._lock:
+            for _ in due:
+                self.spawn_worker()
+            moved = self.rebalance()
+        logger.info(f"Started {len(due)} replacement worker(s), moved {moved} order(s) to them")
+
+    def _shutdown(self):
+        with self._lock:
+            workers = list(self.workers.values())
+            self.workers.clear()
+            self.owners.clear()
+
+        for worker in workers:
+            self._send(worker, ("stop",))
+        for worker in workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
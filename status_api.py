@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+from metrics import metrics_route
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8765,
+    "keepalive": 15.0,
+    "history": 1000
+}
+
+#Fields that change on every poll without anything worth pushing
+VOLATILE_FIELDS = {"checks": 0, "last_update_time": None}
+
+
+def snapshot_to_dict(snapshot):
+    data = snapshot._asdict()
+    if isinstance(data["last_update_time"], datetime):
+        data["last_update_time"] = data["last_update_time"].isoformat(timespec="seconds")
+    return data
+
+
+class StatusStore:
+    """Latest snapshot of every order plus a short log of recent changes.
+
+    Fed from the engine thread via update(); HTTP handlers only ever read
+    from here, so serving a request never causes an upstream call. Event
+    ids carry an epoch unique to this process, so an id handed out before
+    a restart is never mistaken for one of this run's.
+    """
+
+    def __init__(self, history=1000):
+        self.snapshots = {}
+        self.changes = deque(maxlen=history)
+        self.sequence = 0
+        self.epoch = f"{int(time.time()):x}{os.getpid():x}"
+        self.condition = threading.Condition()
+        self._orders_json = None
+
+    def update(self, state):
+        """Engine listener, records state if anything but the poll bookkeeping changed."""
+        snapshot = state.snapshot()
+        previous = self.snapshots.get(snapshot.key)
+
+        if previous is not None and previous._replace(**VOLATILE_FIELDS) == snapshot._replace(**VOLATILE_FIELDS):
+            with self.condition:
+                self.snapshots[snapshot.key] = snapshot
+                self._orders_json = None
+            return
+
+        payload = json.dumps(snapshot_to_dict(snapshot))
+        with self.condition:
+            self.snapshots[snapshot.key] = snapshot
+            self.sequence += 1
+            self.changes.append((self.sequence, payload))
+            self._orders_json = None
+            self.condition.notify_all()
+
+    def remove(self, key):
+        with self.condition:
+            if self.snapshots.pop(key, None) is not None:
+                self.sequence += 1
+                self.changes.append((self.sequence, json.dumps({"key": key, "removed": True})))
+                self._orders_json = None
+                self.condition.notify_all()
+
+    def orders_json(self):
+        """Serialised bulk snapshot, rebuilt only after something changed."""
+        return self.resync()[1]
+
+    def resync(self):
+        """(sequence, orders_json body) taken together, to restart a stream from."""
+        with self.condition:
+            body = self._orders_json
+            if body is None:
+                body = self._orders_json = json.dumps({
+                    "sequence": self.sequence,
+                    "orders": [snapshot_to_dict(snapshot) for snapshot in self.snapshots.values()]
+                }).encode()
+            return self.sequence, body
+
+    def event_id(self, sequence):
+        return f"{self.epoch}-{sequence}"
+
+    def resume_from(self, event_id):
+        """Sequence to continue after event_id, or None if changes since then are not all kept."""
+        epoch, _, sequence = (event_id or "").rpartition("-")
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        with self.condition:
+            oldest = self.changes[0][0] if self.changes else self.sequence + 1
+            if oldest - 1 <= sequence <= self.sequence:
+                return sequence
+        return None
+
+    def changes_after(self, sequence, timeout):
+        """Wait up to timeout for changes newer than sequence and return them."""
+        with self.condition:
+            if self.sequence <= sequence:
+                self.condition.wait(timeout)
+            return [change for change in self.changes if change[0] > sequence]
+
+
+class StatusRequestHandler(BaseHTTPRequestHandler):
+    server_version = "PizzaTracker"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s" % (self.address_string(), format % args))
+
+    def send_body(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/") or "/"
+        store = self.server.store
+
+        if path == "/orders":
+            self.send_body(200, store.orders_json())
+        elif path.startswith("/orders/"):
+            snapshot = store.snapshots.get(unquote(path[len("/orders/"):]))
+            if snapshot is None:
+                self.send_body(404, b'{"error": "Unknown order"}')
+            else:
+                self.send_body(200, json.dumps(snapshot_to_dict(snapshot)).encode())
+        elif path == "/events":
+            self.stream_events()
+        elif path in self.server.extra_routes:
+            status, content_type, body = self.server.extra_routes[path]()
+            self.send_body(status, body, content_type)
+        else:
+            self.send_body(404, b'{"error": "Not found"}')
+
+    def stream_events(self):
+        """Server-Sent Events: one `order` event per change, resuming from Last-Event-ID.
+
+        A Last-Event-ID from another run, or older than the changes still
+        kept, gets a `resync` event with the whole /orders body first, and
+        so does a client that falls that far behind while connected.
+        """
+        store = self.server.store
+
+        last_event_id = self.headers.get("Last-Event-ID")
+        sequence = store.resume_from(last_event_id)
+        resync = sequence is None and bool(last_event_id)
+        if sequence is None:
+            sequence = store.sequence
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.close_connection = True
+
+        try:
+            while not self.server.stopping:
+                if resync:
+                    sequence, body = store.resync()
+                    self.wfile.write(f"id: {store.event_id(sequence)}\nevent: resync\ndata: {body.decode()}\n\n".encode())
+                    self.wfile.flush()
+
+                changes = store.changes_after(sequence, self.server.keepalive)
+                #Changes between sequence and the oldest kept one were dropped
+                resync = bool(changes) and changes[0][0] > sequence + 1
+                if resync:
+                    continue
+                if not changes:
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    self.wfile.write("".join(
+                        f"id: {store.event_id(seq)}\nevent: order\ndata: {payload}\n\n" for seq, payload in changes
+                    ).encode())
+                    sequence = changes[-1][0]
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class StatusServer(ThreadingHTTPServer):
+    """Local HTTP/JSON and SSE API over a StatusStore."""
+
+    daemon_threads = True
+
+    def __init__(self, store, host="127.0.0.1", port=8765, keepalive=15.0):
+        super().__init__((host, port), StatusRequestHandler)
+        self.store = store
+        self.keepalive = keepalive
+        self.stopping = False
+        self.extra_routes = {}
+        self.thread = None
+
+    def add_route(self, path, handler):
+        """Serve path from handler() -> (status, content type, body bytes)."""
+        self.extra_routes[path] = handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="pizza-status-api")
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(f"Status API listening on http://{self.server_address[0]}:{self.server_address[1]}")
+        return self
+
+    def stop(self):
+        self.stopping = True
+        with self.store.condition:
+            self.store.condition.notify_all()
+        self.shutdown()
+        self.server_close()
+
+
+def build_status_api(config, engine):
+    """Create a StatusStore fed by engine and the server exposing it."""
+    settings = dict(DEFAULT_API_CONFIG)
+    settings.update(config.get("api", {}))
+
+    store = StatusStore(settings["history"])
+    for state in engine.orders.values():
+        store.update(state)
+    engine.add_listener(store.update)
+    engine.add_removed_listener(store.remove)
+
+    server = StatusServer(store, settings["host"], settings["port"], settings["keepalive"])
+    server.add_route("/metrics", metrics_route)
+    return store, server
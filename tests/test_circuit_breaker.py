@@ -0,0 +1,54 @@
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def failing(breaker, count, now):
+    for _ in range(count):
+        breaker.record(False, now)
+
+
+def test_opens_at_failure_rate_after_min_requests():
+    breaker = CircuitBreaker("dominos", window=30, min_requests=4, failure_rate=0.5, open_seconds=10)
+    breaker.record(True, 100)
+    failing(breaker, 2, 100)
+    assert breaker.state == CLOSED
+
+    failing(breaker, 1, 101)
+    assert breaker.state == OPEN
+    assert not breaker.allow(105)
+    assert breaker.retry_in(105) == 6
+
+
+def test_old_outcomes_slide_out_of_the_window():
+    breaker = CircuitBreaker("dominos", window=3, min_requests=3, failure_rate=0.5)
+    failing(breaker, 2, 100)
+    breaker.record(True, 104)
+    failing(breaker, 1, 104)
+    assert breaker.state == CLOSED
+    assert (breaker.successes, breaker.failures) == (1, 1)
+
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = CircuitBreaker("dominos", min_requests=1, open_seconds=10, probes=1)
+    failing(breaker, 1, 100)
+    assert breaker.state == OPEN
+
+    #One probe at a time once open_seconds are up
+    assert breaker.allow(110)
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow(110)
+    breaker.record(False, 110)
+    assert breaker.state == OPEN
+
+    assert breaker.allow(120)
+    breaker.record(True, 120)
+    assert breaker.state == CLOSED
+    assert breaker.allow(120)
+
+
+def test_from_config_merges_service_override():
+    config = {
+        "circuit_breaker": {"open_seconds": 60, "probes": 2},
+        "pizza_services": {"dominos": {"circuit_breaker": {"probes": 3}}}
+    }
+    breaker = CircuitBreaker.from_config(config, "dominos")
+    assert (breaker.open_seconds, breaker.probes, breaker.window) == (60, 3, 30)
@@ -0,0 +1,74 @@
+import copy
+import json
+
+import pytest
+
+from config_loader import ConfigError, Settings, load_file
+
+CONFIG = {
+    "check_interval": 10,
+    "max_in_flight": 8,
+    "pizza_services": {
+        "dominos": {"enabled": True, "base_url": "http://localhost:5000/power/trackOrder", "rate_limit": 5},
+        "pizza_hut": {"enabled": False}
+    },
+    "orders": [{"service": "dominos", "store_id": "1234", "order_key": "ABCD1234"}]
+}
+
+
+def with_changes(**sections):
+    config = copy.deepcopy(CONFIG)
+    config.update(sections)
+    return config
+
+
+def test_valid_config():
+    settings = Settings(CONFIG)
+    assert settings.check_interval == 10
+    assert settings.services["dominos"].rate_limit == 5
+    assert len(settings.orders) == 1
+
+
+@pytest.mark.parametrize("changes, message", [
+    ({"check_interval": 0}, "check_interval"),
+    ({"max_in_flight": "8"}, "max_in_flight"),
+    ({"orders": {}}, "orders"),
+    ({"schedule": {"slow_intervall": 30}}, "schedule.slow_intervall is not a known setting"),
+    ({"schedule": {"jitter": "0.1"}}, "schedule.jitter"),
+    ({"http": {"pool_size": 0}}, "http.pool_size must be a positive number"),
+    ({"http": {"read_timeout": 0}}, "http.read_timeout must be a positive number"),
+    ({"circuit_breaker": {"window": 0}}, "circuit_breaker.window must be a positive number"),
+    ({"circuit_breaker": {"probes": 0}}, "circuit_breaker.probes must be a positive number"),
+    ({"estimator": {"stage_seconds": {"OrderBaking": -1}}}, "estimator.stage_seconds.OrderBaking"),
+])
+def test_rejects_bad_values(changes, message):
+    with pytest.raises(ConfigError, match=message):
+        Settings(with_changes(**changes))
+
+
+def test_rejects_bad_service():
+    config = copy.deepcopy(CONFIG)
+    config["pizza_services"]["dominos"]["max_in_flight"] = 0
+    with pytest.raises(ConfigError, match="pizza_services.dominos.max_in_flight"):
+        Settings(config)
+
+
+def test_changed_services():
+    before = Settings(CONFIG)
+    config = copy.deepcopy(CONFIG)
+    config["pizza_services"]["dominos"]["rate_limit"] = 10
+    assert Settings(config).changed_services(before) == {"dominos"}
+
+    #Shared sections apply to every service
+    assert Settings(with_changes(circuit_breaker={"open_seconds": 5})).changed_services(before) == {"dominos", "pizza_hut"}
+    assert Settings(with_changes(http={"read_timeout": 5})).changed_services(before) == {"dominos", "pizza_hut"}
+    assert Settings(with_changes(schedule={"jitter": 0})).changed_services(before) == set()
+
+
+def test_load_file_merges_over_defaults(tmp_path):
+    path = tmp_path / "pizza_config.json"
+    path.write_text(json.dumps({"check_interval": 5, "pizza_services": {"dominos": {"rate_limit": 2}}}))
+
+    config = load_file(str(path), CONFIG)
+    assert config["check_interval"] == 5
+    assert config["pizza_services"]["dominos"] == dict(CONFIG["pizza_services"]["dominos"], rate_limit=2)
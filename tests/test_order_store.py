@@ -0,0 +1,47 @@
+import pytest
+
+import order_store
+from order_store import OrderStore
+from tracking_engine import OrderState
+
+
+@pytest.fixture(params=["numpy", "python"])
+def store(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(order_store, "_numpy", lambda: None)
+    elif order_store._numpy() is None:
+        pytest.skip("numpy is not installed")
+
+    store = OrderStore()
+    orders = [
+        ("dominos", "1", "OrderSent", 0.4, False),
+        ("dominos", "2", "OrderSent", 2.0, False),
+        ("dominos", "3", "OrderBaking", None, False),
+        ("pizza_hut", "4", "OrderSent", 0.1, False),
+        ("dominos", "5", "OrderDelivered", 0.0, True),
+    ]
+    for service, key, status, distance, delivered in orders:
+        params = {"store_id": "1234", "order_key": key} if service == "dominos" else {"order_id": key}
+        state = OrderState(service, params, store)
+        state.raw_status = status
+        state.delivery_distance = distance
+        state.is_delivered = delivered
+    return store
+
+
+def test_select_by_status_and_distance(store):
+    assert store.select(status="OrderSent", max_distance=0.5) == ["dominos:1234/1", "pizza_hut:4"]
+    assert store.select(status="OrderSent", service="dominos") == ["dominos:1234/1", "dominos:1234/2"]
+    assert store.select(status="OrderPlaced") == []
+
+
+def test_select_delivered(store):
+    assert store.select(delivered=True) == ["dominos:1234/5"]
+    assert len(store.select(delivered=False)) == 4
+    assert store.select(service="papa_johns") == []
+
+
+def test_select_skips_released_rows(store):
+    store.release(0)
+    assert store.select(status="OrderSent", max_distance=0.5) == ["pizza_hut:4"]
+    assert len(store.select()) == 4
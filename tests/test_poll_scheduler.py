@@ -0,0 +1,35 @@
+from poll_scheduler import PollScheduler
+
+
+def test_pop_due_in_time_order():
+    scheduler = PollScheduler()
+    scheduler.schedule("b", 2)
+    scheduler.schedule("a", 1)
+    scheduler.schedule("c", 5)
+
+    assert scheduler.next_due() == 1
+    assert scheduler.pop_due(3) == ["a", "b"]
+    assert len(scheduler) == 1
+    assert "c" in scheduler and "a" not in scheduler
+    assert scheduler.pop_due(4) == []
+    assert scheduler.next_due() == 5
+
+
+def test_reschedule_and_cancel_skip_stale_entries():
+    scheduler = PollScheduler()
+    scheduler.schedule("a", 1)
+    scheduler.schedule("b", 2)
+    scheduler.schedule("a", 10)
+    scheduler.cancel("b")
+
+    assert scheduler.next_due() == 10
+    assert scheduler.pop_due(5) == []
+    assert scheduler.pop_due(10) == ["a"]
+    assert scheduler.next_due() is None
+    assert len(scheduler) == 0
+
+
+def test_cancel_unknown_key():
+    scheduler = PollScheduler()
+    scheduler.cancel("missing")
+    assert scheduler.pop_due(100) == []
@@ -0,0 +1,18 @@
+import json
+import os
+
+import replay
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def test_replay_matches_transcript(tmp_path, capsys):
+    #The schedule the session was recorded with
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"check_interval": 1, "schedule": {"slow_interval": 1, "fast_interval": 0.5}}))
+
+    assert replay.main([os.path.join(FIXTURES, "session.jsonl.gz"), "--config", str(config)]) == 0
+
+    with open(os.path.join(FIXTURES, "session_transcript.txt")) as f:
+        expected = f.read()
+    assert capsys.readouterr().out == expected
@@ -0,0 +1,662 @@
+import asyncio
+import logging
+import math
+import queue
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import metrics
+from circuit_breaker import OPEN, CircuitBreaker, CircuitOpenError
+from clock import SystemClock
+from config_loader import Settings
+from eta_estimator import EtaEstimator
+from http_transport import build_transport
+from order_store import DELIVERED, DISTANCE_FALLING, NAN, STATUS_CODES, STATUSES, OrderStore, optional
+from pizza_services import get_adapter_class
+from poll_scheduler import PollPolicy, PollScheduler
+
+logger = logging.getLogger(__name__)
+
+#Row storage for orders not (yet) tracked by an engine
+DEFAULT_STORE = OrderStore()
+
+
+def key_params_for(service):
+    """The tracking params that identify an order for a service."""
+    adapter_class = get_adapter_class(service)
+    return adapter_class.key_params if adapter_class is not None else ()
+
+
+def make_order_key(service, params):
+    """Build the unique key used to identify an order across services."""
+    names = key_params_for(service) or sorted(params)
+    return service + ":" + "/".join(str(params.get(name, "")) for name in names)
+
+
+#Immutable copy of an OrderState, safe to hand to other threads
+OrderSnapshot = namedtuple("OrderSnapshot", [
+    "key", "service", "raw_status", "current_status", "delivery_eta", "delivery_distance",
+    "current_order", "progress", "is_delivered", "last_update_time", "last_error", "checks",
+    "predicted_eta", "predicted_progress"
+])
+
+#Published to subscribers in place of a snapshot when an order stops being tracked
+OrderRemoved = namedtuple("OrderRemoved", ["key"])
+
+
+class OrderState:
+    """Everything the tracker knows about a single order, owned by the engine thread.
+
+    The numbers live in a row of an OrderStore, the engine's once it tracks
+    the order, and are read and written through the properties below. The
+    engine gives the row back with detach() when it stops tracking the
+    order. The strings are interned, since thousands of orders share the
+    same statuses, ETAs and descriptions.
+    """
+
+    __slots__ = ("service", "params", "key", "current_status", "delivery_eta", "current_order",
+                 "last_error", "predicted_eta", "store", "row")
+
+    def __init__(self, service, params, store=None):
+        self.service = sys.intern(service)
+        self.params = {sys.intern(name): sys.intern(value) if isinstance(value, str) else value
+                       for name, value in params.items()}
+        self.key = make_order_key(service, self.params)
+        self.current_status = "Waiting for order info"
+        self.delivery_eta = None
+        self.current_order = "Getting Order Info"
+        self.last_error = None
+        self.predicted_eta = None
+
+        self.store = store if store is not None else DEFAULT_STORE
+        self.row = self.store.allocate(self.key, self.service)
+
+    def attach(self, store):
+        """Move this order's row into store."""
+        if store is self.store:
+            return
+        row = store.allocate(self.key, self.service)
+        store.copy_row(self.store, self.row, row)
+        self.store.release(self.row)
+        self.store, self.row = store, row
+
+    def detach(self):
+        """Give the row back to its store once the order is no longer tracked.
+
+        The numbers move to a store of their own, so a check still in flight
+        can finish without writing into a row reused by another order.
+        """
+        self.attach(OrderStore())
+
+    @property
+    def raw_status(self):
+        return STATUSES[self.store.status[self.row]]
+
+    @raw_status.setter
+    def raw_status(self, value):
+        self.store.status[self.row] = STATUS_CODES.get(value, 0)
+
+    @property
+    def progress(self):
+        return self.store.progress[self.row]
+
+    @progress.setter
+    def progress(self, value):
+        self.store.progress[self.row] = value
+
+    @property
+    def predicted_progress(self):
+        return self.store.predicted_progress[self.row]
+
+    @predicted_progress.setter
+    def predicted_progress(self, value):
+        self.store.predicted_progress[self.row] = value
+
+    @property
+    def delivery_distance(self):
+        return optional(self.store.distance[self.row])
+
+    @delivery_distance.setter
+    def delivery_distance(self, value):
+        self.store.distance[self.row] = NAN if value is None else value
+
+    @property
+    def last_update_time(self):
+        updated = self.store.updated[self.row]
+        return None if math.isnan(updated) else datetime.fromtimestamp(updated)
+
+    @last_update_time.setter
+    def last_update_time(self, value):
+        self.store.updated[self.row] = NAN if value is None else value.timestamp()
+
+    @property
+    def last_latency(self):
+        return optional(self.store.latency[self.row])
+
+    @last_latency.setter
+    def last_latency(self, value):
+        self.store.latency[self.row] = NAN if value is None else value
+
+    @property
+    def checks(self):
+        return self.store.checks[self.row]
+
+    @checks.setter
+    def checks(self, value):
+        self.store.checks[self.row] = value
+
+    @property
+    def failures(self):
+        return self.store.failures[self.row]
+
+    @failures.setter
+    def failures(self, value):
+        self.store.failures[self.row] = value
+
+    def _flag(self, bit):
+        return bool(self.store.flags[self.row] & bit)
+
+    def _set_flag(self, bit, value):
+        if value:
+            self.store.flags[self.row] |= bit
+        else:
+            self.store.flags[self.row] &= ~bit
+
+    is_delivered = property(lambda self: self._flag(DELIVERED), lambda self, value: self._set_flag(DELIVERED, value))
+    distance_falling = property(
+        lambda self: self._flag(DISTANCE_FALLING), lambda self, value: self._set_flag(DISTANCE_FALLING, value)
+    )
+
+    def snapshot(self):
+        return OrderSnapshot(
+            self.key, self.service, self.raw_status, self.current_status, self.delivery_eta,
+            self.delivery_distance, self.current_order, self.progress, self.is_delivered,
+            self.last_update_time, self.last_error, self.checks, self.predicted_eta, self.predicted_progress
+        )
+
+    def apply(self, result, when=None):
+        """Copy a parsed service response onto this order, returns True if it just got delivered.
+
+        when is the epoch time of the response, now if not given.
+        """
+        self.store.updated[self.row] = when if when is not None else time.time()
+        self.last_error = None
+        self.failures = 0
+
+        #304 Not Modified, nothing but the check time changed
+        if result.get("not_modified"):
+            return False
+
+        if "raw_status" in result:
+            self.raw_status = result["raw_status"]
+        if "status" in result:
+            self.current_status = sys.intern(result["status"])
+        self.progress = result.get("progress", self.progress)
+
+        if result.get("eta"):
+            self.delivery_eta = sys.intern(result["eta"])
+        if result.get("distance") is not None:
+            previous = self.delivery_distance
+            if previous is not None:
+                self.distance_falling = result["distance"] < previous
+            self.delivery_distance = result["distance"]
+        if result.get("description"):
+            self.current_order = sys.intern(result["description"])
+
+        if result.get("delivered") and not self.is_delivered:
+            self.is_delivered = True
+            return True
+        return False
+
+
+def orders_from_config(config):
+    """Build an OrderState for every order configured for an enabled service."""
+    orders = []
+    seen = set()
+    services = config["pizza_services"]
+
+    candidates = list(config.get("orders", []))
+    for service, service_config in services.items():
+        candidates.append(dict(service_config.get("tracking_params", {}), service=service))
+
+    for entry in candidates:
+        entry = dict(entry)
+        service = entry.pop("service", None)
+        if service not in services or not services[service].get("enabled"):
+            continue
+
+        required = key_params_for(service)
+        if not required or not all(entry.get(name) for name in required):
+            continue
+
+        state = OrderState(service, entry)
+        if state.key not in seen:
+            seen.add(state.key)
+            orders.append(state)
+
+    return orders
+
+
+class TrackingEngine:
+    """Polls any number of orders across all services concurrently.
+
+    Orders wait in a PollScheduler heap until they are due. The blocking
+    HTTP calls run on a thread pool; a semaphore caps how many are in
+    flight at once, so one slow order never holds up the others. With a
+    ResponseCache, every result is kept in it and orders start out showing
+    their last cached state.
+    """
+
+    def __init__(self, config, orders=None, max_in_flight=32, event_log=None, cache=None,
+                 clock=None, transport_factory=None, recorder=None):
+        self.config = config
+        self.settings = Settings(config)
+        self.event_log = event_log
+        self.cache = cache
+        self.clock = clock or SystemClock()
+        self.transport_factory = transport_factory or build_transport
+        self.recorder = recorder
+        self.orders = {}
+        self.max_in_flight = max_in_flight
+        self.running = False
+        self.loop = None
+        self.thread = None
+        self.listeners = []
+        self.delivered_listeners = []
+        self.removed_listeners = []
+        self.subscribers = []
+
+        self.transports = {}
+        self.adapters = {}
+        self.breakers = {}
+        self.service_slots = {}
+        self.scheduler = PollScheduler()
+        self.policy = PollPolicy.from_config(config)
+        self.estimator = EtaEstimator.from_config(config)
+        self.store = OrderStore()
+
+        self._executor = None
+        self._semaphore = None
+        self._wakeup = None
+        self._tasks = set()
+
+        #Orders taken from the config follow it when it is reloaded
+        self.config_orders = orders is None
+        for state in orders if orders is not None else orders_from_config(config):
+            state.attach(self.store)
+            self.orders[state.key] = state
+            self.warm_start(state)
+
+    def select(self, status=None, max_distance=None, service=None, delivered=None):
+        """Tracked orders matching all the given conditions, see OrderStore.select."""
+        orders = self.orders
+        return [orders[key] for key in self.store.select(status, max_distance, service, delivered) if key in orders]
+
+    def add_listener(self, callback):
+        """Call callback(state) on the engine thread after every completed check."""
+        self.listeners.append(callback)
+
+    def add_delivered_listener(self, callback):
+        """Call callback(state) on the engine thread once when an order is delivered."""
+        self.delivered_listeners.append(callback)
+
+    def add_removed_listener(self, callback):
+        """Call callback(key) when an order stops being tracked."""
+        self.removed_listeners.append(callback)
+
+    def subscribe(self):
+        """Return a queue that receives an OrderSnapshot after every check.
+
+        Meant for consumers on other threads, such as the curses UI. The
+        queue starts with a snapshot of every order currently tracked.
+        """
+        channel = queue.SimpleQueue()
+        if self.loop is not None and self.running:
+            self.loop.call_soon_threadsafe(self._add_subscriber, channel)
+        else:
+            self._add_subscriber(channel)
+        return channel
+
+    def unsubscribe(self, channel):
+        if self.loop is not None and self.running:
+            self.loop.call_soon_threadsafe(self._remove_subscriber, channel)
+        else:
+            self._remove_subscriber(channel)
+
+    def _add_subscriber(self, channel):
+        for state in self.orders.values():
+            channel.put(state.snapshot())
+        self.subscribers.append(channel)
+
+    def _remove_subscriber(self, channel):
+        if channel in self.subscribers:
+            self.subscribers.remove(channel)
+
+    def publish(self, state):
+        """Hand a fresh snapshot of state to every subscriber."""
+        snapshot = state.snapshot()
+        for channel in self.subscribers:
+            channel.put(snapshot)
+
+    def warm_start(self, state):
+        """Show the last cached state of an order that has not been checked yet."""
+        if self.cache is None or state.last_update_time is not None:
+            return
+        entry = self.cache.peek(state.key)
+        if entry is not None:
+            result, stored_at = entry
+            state.apply(result, stored_at)
+
+    def add_order(self, state):
+        state.attach(self.store)
+        self.orders[state.key] = state
+        self.warm_start(state)
+        if self.loop is not None and self.running:
+            self.loop.call_soon_threadsafe(self._schedule, state.key, 0)
+        return state
+
+    def remove_order(self, key):
+        state = self.orders.pop(key, None)
+        if state is not None:
+            state.detach()
+            self._forget_validators(state)
+        self.estimator.forget(key)
+        if self.loop is not None and self.running:
+            self.loop.call_soon_threadsafe(self.scheduler.cancel, key)
+        else:
+            self.scheduler.cancel(key)
+
+        if state is not None:
+            for callback in self.removed_listeners:
+                callback(key)
+            for channel in self.subscribers:
+                channel.put(OrderRemoved(key))
+        return state
+
+    def _forget_validators(self, state):
+        """Drop the ETag/Last-Modified the transport keeps for an order that is no longer tracked."""
+        adapter = self.adapters.get(state.service)
+        if adapter is not None:
+            adapter.transport.forget(*adapter.build_request(state.params))
+
+    def apply_config(self, config):
+        """Swap in a reloaded config, safe to call from any thread."""
+        if self.loop is not None and self.running:
+            self.loop.call_soon_threadsafe(self._apply_config, config)
+        else:
+            self._apply_config(config)
+
+    def _apply_config(self, config):
+        #Build everything the new config needs before swapping anything, so a bad one changes nothing
+        try:
+            settings = Settings(config)
+            policy = PollPolicy.from_config(config)
+            for service in settings.services:
+                CircuitBreaker.from_config(config, service)
+        except (ValueError, TypeError) as e:
+            logger.error(f"Ignoring configuration that cannot be applied: {e}")
+            return
+        changed = settings.changed_services(self.settings)
+        if settings.raw.get("estimator") != self.settings.raw.get("estimator"):
+            self.estimator.configure(**EtaEstimator.settings(config))
+
+        self.config = config
+        self.settings = settings
+        self.policy = policy
+
+        #Checks already in flight release the semaphores they took, new ones get the new limits
+        self.service_slots.clear()
+
+        #Rebuild the adapter, connection pool and breaker of every changed service
+        for service in changed:
+            self.adapters.pop(service, None)
+            self.breakers.pop(service, None)
+            transport = self.transports.pop(service, None)
+            if transport is not None:
+                self._close_later(transport)
+
+        if self.config_orders:
+            wanted = {state.key: state for state in orders_from_config(config)}
+            for key in [key for key in self.orders if key not in wanted]:
+                self.remove_order(key)
+            for key, state in wanted.items():
+                if key not in self.orders:
+                    self.add_order(state)
+                else:
+                    state.detach()
+
+        #Orders of a changed service are checked again straight away, the rest keep their schedule
+        if self.running:
+            for state in self.orders.values():
+                if state.service in changed and state.key in self.scheduler:
+                    self._schedule(state.key, 0)
+
+        logger.info(f"Configuration applied, {len(changed)} service(s) changed, tracking {len(self.orders)} order(s)")
+
+    def _close_later(self, transport):
+        #Requests already in flight may still be using it
+        if self.loop is not None and self.running:
+            self.loop.call_later(self.config.get("http", {}).get("read_timeout", 10) + 1, transport.close)
+        else:
+            transport.close()
+
+    def get_transport(self, service):
+        """Return the pooled transport for a service, creating it on first use."""
+        transport = self.transports.get(service)
+        if transport is None:
+            service_config = self.config["pizza_services"][service]
+            http_config = dict(self.config.get("http", {}))
+            http_config.setdefault("pool_size", self.max_in_flight)
+            transport = self.transport_factory(service, service_config, http_config)
+            self.transports[service] = transport
+        return transport
+
+    def get_adapter(self, service):
+        """Return the adapter instance for a service, importing it on first use."""
+        adapter = self.adapters.get(service)
+        if adapter is None:
+            adapter_class = get_adapter_class(service)
+            if adapter_class is None:
+                return None
+            adapter = adapter_class(self.config["pizza_services"][service], self.get_transport(service), self._executor)
+            adapter.recorder = self.recorder
+            self.adapters[service] = adapter
+        return adapter
+
+    def get_service_slots(self, service):
+        """Semaphore capping the checks of one service in flight, so a hung one can't take every slot.
+
+        pizza_services.<name>.max_in_flight, by default half of max_in_flight
+        when more than one service is enabled.
+        """
+        slots = self.service_slots.get(service)
+        if slots is None:
+            limit = self.settings.services[service].max_in_flight
+            if limit is None:
+                enabled = sum(1 for settings in self.settings.services.values() if settings.enabled)
+                limit = self.max_in_flight if enabled <= 1 else max(1, self.max_in_flight // 2)
+            slots = self.service_slots[service] = asyncio.Semaphore(min(limit, self.max_in_flight))
+        return slots
+
+    def get_breaker(self, service):
+        """Return the circuit breaker guarding a service, creating it on first use."""
+        breaker = self.breakers.get(service)
+        if breaker is None:
+            breaker = self.breakers[service] = CircuitBreaker.from_config(self.config, service)
+        return breaker
+
+    def _schedule(self, key, delay):
+        self.scheduler.schedule(key, self.clock.monotonic() + delay)
+        self._wakeup.set()
+
+    def _spawn(self, state):
+        task = self.loop.create_task(self._poll(state))
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        #Lets a virtual clock move on once the last check finished
+        if not self._tasks:
+            self._wakeup.set()
+
+    async def _fetch(self, adapter, state):
+        #Fail fast while the service is known to be down
+        breaker = self.get_breaker(state.service)
+        if not breaker.allow(self.clock.monotonic()):
+            raise CircuitOpenError(f"{state.service} is unavailable, retrying in {breaker.retry_in(self.clock.monotonic()):.0f}s")
+
+        #Wait for the service's rate limit and its own share of the slots before taking a global one
+        await adapter.throttle()
+
+        async with self.get_service_slots(state.service), self._semaphore:
+            started = time.perf_counter()
+            try:
+                result = await adapter.fetch(state)
+            except Exception:
+                breaker.record(False, self.clock.monotonic())
+                raise
+            finally:
+                state.last_latency = time.perf_counter() - started
+                metrics.FETCH_SECONDS.labels(state.service).observe(state.last_latency)
+                metrics.CIRCUIT_OPEN.labels(state.service).set(int(breaker.state == OPEN))
+
+        breaker.record(True, self.clock.monotonic())
+        return result
+
+    async def poll_once(self, state):
+        """Run a single check for one order and apply the result."""
+        adapter = self.get_adapter(state.service)
+        if adapter is None:
+            state.current_status = f"Unknown service: {state.service}"
+            return False
+
+        #Stays at zero when no request went out
+        state.last_latency = 0.0
+        try:
+            result = await self._fetch(adapter, state)
+        except CircuitOpenError as e:
+            #Keep showing the last known (or cached) status rather than an error
+            metrics.ERRORS.labels(state.service, type(e).__name__).inc()
+            if state.raw_status is None:
+                state.current_status = "Service unavailable"
+            state.last_error = str(e)
+            result = None
+        except Exception as e:
+            logger.error(f"Error checking {state.key} status: {e}")
+            metrics.ERRORS.labels(state.service, type(e).__name__).inc()
+            state.current_status = "Error checking status"
+            state.last_error = str(e)
+            state.failures += 1
+            result = None
+
+        state.checks += 1
+        metrics.CHECKS.labels(state.service).inc()
+
+        if result is not None:
+            now = self.clock.time()
+            if self.cache is not None:
+                self.cache.put(state.key, result, now)
+            delivered = state.apply(result, now)
+            self.estimator.update(state, now)
+            if delivered:
+                for callback in self.delivered_listeners:
+                    callback(state)
+
+        if self.event_log is not None:
+            self.event_log.emit(
+                "check", order=state.key, service=state.service, ok=result is not None,
+                status=state.raw_status, distance=state.delivery_distance, error=state.last_error
+            )
+
+        for callback in self.listeners:
+            callback(state)
+
+        self.publish(state)
+
+        return result is not None
+
+    async def _poll(self, state):
+        try:
+            ok = await self.poll_once(state)
+        except Exception as e:
+            logger.exception(f"Error in tracking loop for {state.key}: {e}")
+            ok = False
+
+        #The order may have been removed while it was being checked, and its validators stored again
+        if self.orders.get(state.key) is not state:
+            self._forget_validators(state)
+            return
+
+        breaker = self.breakers.get(state.service)
+        not_before = breaker.retry_in(self.clock.monotonic()) if breaker is not None else 0
+        try:
+            delay = self.policy.next_delay(state, ok, datetime.fromtimestamp(self.clock.time()), not_before)
+        except Exception as e:
+            #An order that leaves the heap is never checked again, keep it on the plain interval
+            logger.exception(f"Error scheduling {state.key}: {e}")
+            delay = self.settings.check_interval
+        if delay is None:
+            logger.info(f"Stopped polling {state.key}: {state.current_status}")
+        else:
+            self._schedule(state.key, delay)
+
+    async def run(self):
+        """Track every order until stop() is called."""
+        self.loop = asyncio.get_running_loop()
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="pizza-poll")
+        self._wakeup = asyncio.Event()
+        self.running = True
+
+        logger.info(f"Starting pizza tracking for {len(self.orders)} order(s)")
+
+        try:
+            for state in list(self.orders.values()):
+                self._schedule(state.key, 0)
+
+            while self.running:
+                now = self.clock.monotonic()
+                metrics.ORDERS.set(len(self.orders))
+
+                #How late the most overdue check is about to start
+                next_due = self.scheduler.next_due()
+                if next_due is not None and next_due <= now:
+                    metrics.POLL_LAG_SECONDS.observe(now - next_due)
+
+                for key in self.scheduler.pop_due(now):
+                    state = self.orders.get(key)
+                    if state is not None:
+                        self._spawn(state)
+
+                #Sleep until the next order is due or the schedule changes
+                next_due = self.scheduler.next_due()
+                timeout = None if next_due is None else max(next_due - self.clock.monotonic(), 0)
+                self._wakeup.clear()
+                await self.clock.wait(self._wakeup, timeout, idle=not self._tasks)
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks.clear()
+            self._executor.shutdown(wait=False)
+            for transport in self.transports.values():
+                transport.close()
+            self.transports.clear()
+            self.adapters.clear()
+
+    def start(self):
+        """Run the engine on its own event loop in a daemon thread."""
+        self.thread = threading.Thread(target=asyncio.run, args=(self.run(),), name="pizza-engine")
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.loop is not None and self._wakeup is not None:
+            self.loop.call_soon_threadsafe(self._wakeup.set)